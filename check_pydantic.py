@@ -1,11 +1,10 @@
-try:
-    from pydantic.v1 import BaseSettings
-    print('v1 BaseSettings found')
-except ImportError:
-    print('v1 BaseSettings not found')
+from importlib.util import find_spec
 
+# find_spec only locates the modules; it does not execute them
 try:
-    from pydantic_settings import BaseSettings
-    print('pydantic_settings found')
+    found = find_spec('pydantic.v1') is not None
 except ImportError:
-    print('pydantic_settings not found')
+    found = False
+print('v1 BaseSettings found' if found else 'v1 BaseSettings not found')
+
+print('pydantic_settings found' if find_spec('pydantic_settings') else 'pydantic_settings not found')
@@ -16,6 +16,14 @@ BOOLEAN_COLUMNS = {
     "debug_config": ["enabled", "log_requests", "log_responses", "mask_token"],
 }
 
+# Config tables and tokens have no foreign keys; everything else references tokens(id)
+MIGRATION_PHASES = [
+    ["admin_config", "proxy_config", "generation_config", "cache_config", "debug_config", "tokens"],
+    ["projects", "token_stats", "tasks", "request_logs"],
+]
+
+TABLES_WITH_ID = ["tokens", "projects", "token_stats", "tasks", "request_logs"]
+
 async def migrate():
     sqlite_path = Path(__file__).parent.parent / "data" / "flow.db"
     pg_url = os.getenv("DATABASE_URL")
@@ -34,88 +42,96 @@ async def migrate():
         sqlite_conn.row_factory = aiosqlite.Row
         
         try:
-            conn = await asyncpg.connect(pg_url)
+            pool = await asyncpg.create_pool(pg_url, min_size=4, max_size=8)
         except Exception as e:
             print(f"Failed to connect to Postgres: {e}")
             return
 
+        # List existing tables once rather than querying sqlite_master per table
+        cursor = await sqlite_conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        existing = {row[0] for row in await cursor.fetchall()}
+
         try:
-            async with conn.transaction():
-                # Config tables first
-                await migrate_table(sqlite_conn, conn, "admin_config")
-                await migrate_table(sqlite_conn, conn, "proxy_config")
-                await migrate_table(sqlite_conn, conn, "generation_config")
-                await migrate_table(sqlite_conn, conn, "cache_config")
-                await migrate_table(sqlite_conn, conn, "debug_config")
-
-                # Core tables
-                await migrate_table(sqlite_conn, conn, "tokens")
-                await migrate_table(sqlite_conn, conn, "projects")
-                await migrate_table(sqlite_conn, conn, "token_stats")
-                await migrate_table(sqlite_conn, conn, "tasks")
-                await migrate_table(sqlite_conn, conn, "request_logs")
-                
-                # Reset sequences
-                tables_with_id = ["tokens", "projects", "token_stats", "tasks", "request_logs"]
-                for table in tables_with_id:
-                     # Check if table has rows
-                    count = await conn.fetchval(f"SELECT COUNT(*) FROM {table}")
-                    if count > 0:
-                        print(f"Resetting sequence for {table}...")
-                        try:
-                            await conn.execute(f"SELECT setval('{table}_id_seq', (SELECT MAX(id) FROM {table}))")
-                        except Exception as e:
-                            print(f"Warning: Failed to reset sequence for {table}: {e}")
+            # Tables inside a phase are independent, so they are copied concurrently
+            # on separate pooled connections. Phases run in order so rows referencing
+            # tokens(id) are only inserted once the tokens table is populated.
+            for phase in MIGRATION_PHASES:
+                await asyncio.gather(*(migrate_table(sqlite_conn, pool, table, existing) for table in phase))
+
+            # Reset sequences
+            await asyncio.gather(*(reset_sequence(pool, table) for table in TABLES_WITH_ID))
 
             print("Migration completed successfully!")
             
         finally:
-            await conn.close()
+            await pool.close()
 
-async def migrate_table(sqlite_conn, pg_conn, table_name):
+async def reset_sequence(pool, table_name):
+    # One statement per table: move the sequence past MAX(id), or leave it
+    # unconsumed at 1 when the table is empty, without a separate COUNT(*)
+    async with pool.acquire() as conn:
+        try:
+            await conn.execute(f"""
+                SELECT setval('{table_name}_id_seq',
+                              COALESCE((SELECT MAX(id) FROM {table_name}), 1),
+                              (SELECT MAX(id) IS NOT NULL FROM {table_name}))
+            """)
+            print(f"Reset sequence for {table_name}.")
+        except Exception as e:
+            print(f"Warning: Failed to reset sequence for {table_name}: {e}")
+
+async def migrate_table(sqlite_conn, pool, table_name, existing):
     print(f"Migrating table {table_name}...")
     
     # Check if table exists in SQLite
-    cursor = await sqlite_conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-    if not await cursor.fetchone():
+    if table_name not in existing:
         print(f"Table {table_name} does not exist in SQLite, skipping.")
         return
 
-    # Get data
+    # Stream rows straight from the SQLite cursor instead of materializing fetchall()
     cursor = await sqlite_conn.execute(f"SELECT * FROM {table_name}")
-    rows = await cursor.fetchall()
-    
-    if not rows:
-        print(f"Table {table_name} is empty.")
-        return
-
-    columns = rows[0].keys()
-    placeholders = ",".join([f"${i+1}" for i in range(len(columns))])
+    columns = [desc[0] for desc in cursor.description]
     cols_str = ",".join(columns)
-    
-    # Prepare insertion
-    # Use ON CONFLICT DO NOTHING to avoid errors if running multiple times or if IDs clash
-    query = f"INSERT INTO {table_name} ({cols_str}) VALUES ({placeholders}) ON CONFLICT (id) DO NOTHING"
-    
-    # Convert rows to list of values, handling boolean conversion
-    pg_rows = []
     bool_cols = BOOLEAN_COLUMNS.get(table_name, [])
-    
-    for row in rows:
-        row_dict = dict(row)
-        values = []
-        for col in columns:
-            val = row_dict[col]
-            if col in bool_cols and isinstance(val, int):
-                 values.append(bool(val))
-            else:
-                 values.append(val)
-        pg_rows.append(values)
-
-    # Batch insert
+    # Resolve which positions need int -> bool coercion once per table, not per cell
+    bool_idx = tuple(i for i, col in enumerate(columns) if col in bool_cols)
+
+    async def records():
+        if not bool_idx:
+            async for row in cursor:
+                yield tuple(row)
+            return
+
+        # Convert rows to tuples of values, handling boolean conversion.
+        # Only the boolean positions are touched; other cells are copied as-is.
+        async for row in cursor:
+            values = list(row)
+            for i in bool_idx:
+                if isinstance(values[i], int):
+                    values[i] = bool(values[i])
+            yield tuple(values)
+
+    # COPY cannot skip conflicting rows, so copy into a staging table first and
+    # merge with ON CONFLICT DO NOTHING to keep re-runs and ID clashes harmless
+    staging = f"_migrate_{table_name}"
+
+    # Bulk copy, one transaction per table
     try:
-        await pg_conn.executemany(query, pg_rows)
-        print(f"Migrated {len(pg_rows)} rows to {table_name}.")
+        async with pool.acquire() as pg_conn:
+            async with pg_conn.transaction():
+                await pg_conn.execute(
+                    f"CREATE TEMP TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                status = await pg_conn.copy_records_to_table(staging, records=records(), columns=columns)
+                copied = int(status.split()[-1])
+                if not copied:
+                    print(f"Table {table_name} is empty.")
+                    return
+                status = await pg_conn.execute(
+                    f"INSERT INTO {table_name} ({cols_str}) SELECT {cols_str} FROM {staging} ON CONFLICT (id) DO NOTHING"
+                )
+                inserted = int(status.split()[-1])
+        print(f"Migrated {inserted} of {copied} rows to {table_name}.")
     except Exception as e:
         print(f"Error migrating table {table_name}: {e}")
         raise
@@ -1,6 +1,7 @@
 import asyncio
 import os
 import sys
+import traceback
 from pathlib import Path
 from datetime import datetime
 
@@ -12,7 +13,11 @@ from src.core.db.postgres import PostgresAdapter
 from src.core.models import Token
 
 async def test_adapter(adapter, name):
-    print(f"Testing {name}...")
+    # Adapters run concurrently, so output is buffered and printed once per adapter
+    lines = []
+    log = lines.append
+
+    log(f"Testing {name}...")
     try:
         if name == "SQLite":
              # Ensure db dir exists for sqlite
@@ -20,11 +25,11 @@ async def test_adapter(adapter, name):
 
         await adapter.init_db()
         if not await adapter.is_initialized():
-             print(f"❌ {name} not initialized")
-             return
+             log(f"❌ {name} not initialized")
+             return lines
+
+        log(f"✓ {name} initialized")
 
-        print(f"✓ {name} initialized")
-        
         # Create a test token
         token_st = f"test_st_{datetime.now().timestamp()}"
         token = Token(
@@ -33,46 +38,57 @@ async def test_adapter(adapter, name):
             name="Test Token",
             is_active=True
         )
-        
+
         token_id = await adapter.add_token(token)
-        print(f"✓ Added token with ID: {token_id}")
-        
+        log(f"✓ Added token with ID: {token_id}")
+
         fetched_token = await adapter.get_token(token_id)
         if fetched_token and fetched_token.st == token_st:
-            print(f"✓ Verified token: {fetched_token.email}")
+            log(f"✓ Verified token: {fetched_token.email}")
         else:
-             print(f"❌ Failed to verify token")
+             log(f"❌ Failed to verify token")
 
         # Clean up
         await adapter.delete_token(token_id)
-        print(f"✓ Cleaned up test token")
+        log(f"✓ Cleaned up test token")
 
     except Exception as e:
-        print(f"❌ Error testing {name}: {e}")
-        import traceback
-        traceback.print_exc()
+        log(f"❌ Error testing {name}: {e}")
+        log(traceback.format_exc())
+
+    return lines
 
 async def run_smoke_test():
     print("Starting smoke test...")
-    
+
+    tests = []
+
     # Test SQLite
     try:
         sqlite_adapter = SqliteAdapter()
-        await test_adapter(sqlite_adapter, "SQLite")
+        tests.append(test_adapter(sqlite_adapter, "SQLite"))
     except Exception as e:
         print(f"Failed to instantiate SQLite adapter: {e}")
-    
+
     # Test Postgres if URL provided
     pg_url = os.getenv("DATABASE_URL")
     if pg_url:
-        print("\n")
         try:
             pg_adapter = PostgresAdapter(pg_url)
-            await test_adapter(pg_adapter, "Postgres")
+            tests.append(test_adapter(pg_adapter, "Postgres"))
         except Exception as e:
             print(f"Failed to instantiate Postgres adapter: {e}")
     else:
-        print("\nSkipping Postgres test (DATABASE_URL not set)")
+        print("Skipping Postgres test (DATABASE_URL not set)")
+
+    # Adapters use independent connections, so run them concurrently
+    results = await asyncio.gather(*tests, return_exceptions=True)
+    for result in results:
+        print("\n")
+        if isinstance(result, BaseException):
+            print(f"❌ Smoke test crashed: {result}")
+        else:
+            print("\n".join(result))
 
 if __name__ == "__main__":
     asyncio.run(run_smoke_test())
@@ -1,9 +1,9 @@
 """Admin API routes"""
-import os
 from fastapi import APIRouter, Depends, HTTPException, Header
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List
+from datetime import datetime
 import secrets
 from ..core.auth import AuthManager
 from ..core.db.base import DatabaseAdapter
@@ -390,7 +390,8 @@ async def st_to_at(
 @router.get("/api/config/effective")
 async def get_effective_config(token: str = Depends(verify_admin_token)):
     """Get effective configuration with lock status"""
-    raw_config = config.get_raw_config()
+    # get_raw_config is a shared read-only view, so copy before masking
+    raw_config = {section: dict(values) for section, values in config.get_raw_config().items()}
     
     # Mask secrets
     if "global" in raw_config:
@@ -459,8 +460,8 @@ async def get_generation_config(token: str = Depends(verify_admin_token)):
         "config": {
             "image_timeout": config.image_timeout,
             "video_timeout": config.video_timeout,
-            "image_timeout_locked": os.getenv("GENERATION_IMAGE_TIMEOUT") is not None,
-            "video_timeout_locked": os.getenv("GENERATION_VIDEO_TIMEOUT") is not None,
+            "image_timeout_locked": config.is_env_locked("GENERATION_IMAGE_TIMEOUT"),
+            "video_timeout_locked": config.is_env_locked("GENERATION_VIDEO_TIMEOUT"),
         }
     }
 
@@ -499,16 +500,18 @@ async def purge_cache(token: str = Depends(verify_admin_token)):
 @router.get("/api/system/info")
 async def get_system_info(token: str = Depends(verify_admin_token)):
     """Get system information"""
-    tokens = await token_manager.get_all_tokens()
-    active_tokens = [t for t in tokens if t.is_active]
-
-    total_credits = sum(t.credits for t in active_tokens)
+    total_tokens = active_tokens = total_credits = 0
+    async for t in token_manager.iter_all_tokens():
+        total_tokens += 1
+        if t.is_active:
+            active_tokens += 1
+            total_credits += t.credits
 
     return {
         "success": True,
         "info": {
-            "total_tokens": len(tokens),
-            "active_tokens": len(active_tokens),
+            "total_tokens": total_tokens,
+            "active_tokens": active_tokens,
             "total_credits": total_credits,
             "version": "1.0.0"
         }
@@ -568,10 +571,13 @@ async def get_stats(token: str = Depends(verify_admin_token)):
 @router.get("/api/logs")
 async def get_logs(
     limit: int = 100,
+    before_created_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
     token: str = Depends(verify_admin_token)
 ):
-    """Get request logs with token email"""
-    logs = await db.get_logs(limit=limit)
+    """Get request logs with token email (pass the last row's created_at/id to fetch the next page)"""
+    before = (before_created_at, before_id) if before_created_at is not None and before_id is not None else None
+    logs = await db.get_logs(limit=limit, before=before)
 
     return [{
         "id": log.get("id"),
@@ -585,6 +591,18 @@ async def get_logs(
     } for log in logs]
 
 
+@router.get("/api/logs/{log_id}")
+async def get_log_detail(
+    log_id: int,
+    token: str = Depends(verify_admin_token)
+):
+    """Get a single request log including request/response bodies"""
+    log = await db.get_log_detail(log_id)
+    if not log:
+        raise HTTPException(status_code=404, detail="Log not found")
+    return log
+
+
 @router.get("/api/admin/config")
 async def get_admin_config(token: str = Depends(verify_admin_token)):
     """Get admin configuration"""
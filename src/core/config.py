@@ -1,259 +1,174 @@
 """Configuration management for Flow2API"""
-import os
-from typing import Dict, Any, Optional
-from .settings import settings
+from os import environ as _ENV
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, Tuple
+from pydantic import AliasChoices
+from .settings import Settings, get_settings, _TOML_FIELDS
+
+
+# Field -> env var name (the second AliasChoices entry, by our definition), resolved once at import
+_FIELD_ENV_VARS: Tuple[str, ...] = tuple(
+    field_info.validation_alias.choices[1]
+    for field_info in Settings.model_fields.values()
+    if isinstance(field_info.validation_alias, AliasChoices) and len(field_info.validation_alias.choices) > 1
+)
 
 class Config:
     """Application configuration wrapper around Settings with mutable overrides"""
 
+    # Overridable attribute -> Settings field (which is also the env var that locks it)
+    _OVERRIDES: Dict[str, str] = {
+        "admin_username": "ADMIN_USERNAME",
+        "admin_password": "ADMIN_PASSWORD",
+        "api_key": "API_KEY",
+        "error_ban_threshold": "ADMIN_ERROR_BAN_THRESHOLD",
+        "debug_enabled": "DEBUG_ENABLED",
+        "debug_log_requests": "DEBUG_LOG_REQUESTS",
+        "debug_log_responses": "DEBUG_LOG_RESPONSES",
+        "debug_mask_token": "DEBUG_MASK_TOKEN",
+        "proxy_enabled": "PROXY_ENABLED",
+        "proxy_url": "PROXY_URL",
+        "image_timeout": "GENERATION_IMAGE_TIMEOUT",
+        "video_timeout": "GENERATION_VIDEO_TIMEOUT",
+        "cache_enabled": "CACHE_ENABLED",
+        "cache_timeout": "CACHE_TIMEOUT",
+        "cache_base_url": "CACHE_BASE_URL",
+    }
+
+    # Fixed attribute set: no per-instance __dict__, and a stable layout for attribute lookups
+    __slots__ = (
+        "_settings", "_locked_envs", "_locked_status", "_raw_cache",
+        "flow_labs_base_url", "flow_api_base_url", "flow_timeout", "flow_max_retries",
+        "poll_interval", "max_poll_attempts", "server_host", "server_port",
+        "storage_backend", "s3_bucket_name", "s3_region_name", "s3_endpoint_url",
+        "s3_access_key", "s3_secret_key", "s3_public_domain", "database_url",
+        "db_pool_size", "db_max_overflow", "db_pool_recycle", "cache_hash_algo",
+    ) + tuple(_OVERRIDES)
+
     def __init__(self):
-        # We rely on the global settings instance which has loaded from Env > TOML > Defaults
-        self._settings = settings
+        # We rely on the shared settings instance which has loaded from Env > TOML > Defaults
+        settings = self._settings = get_settings()
+
+        # Env is read once at startup: a setting present in the environment stays locked
+        self._locked_envs = frozenset(k for k in _FIELD_ENV_VARS if k in _ENV)
+        self._locked_status: Mapping[str, bool] = MappingProxyType(
+            {env_var: env_var in self._locked_envs for env_var in _FIELD_ENV_VARS}
+        )
         
-        # Runtime overrides (from DB)
-        self._db_admin_username: Optional[str] = None
-        self._db_admin_password: Optional[str] = None
-        self._db_api_key: Optional[str] = None
-        self._db_debug_enabled: Optional[bool] = None
-        self._db_debug_log_requests: Optional[bool] = None
-        self._db_debug_log_responses: Optional[bool] = None
-        self._db_debug_mask_token: Optional[bool] = None
-        self._db_proxy_enabled: Optional[bool] = None
-        self._db_proxy_url: Optional[str] = None
-        self._db_image_timeout: Optional[int] = None
-        self._db_video_timeout: Optional[int] = None
-        self._db_error_ban_threshold: Optional[int] = None
-        self._db_cache_enabled: Optional[bool] = None
-        self._db_cache_timeout: Optional[int] = None
-        self._db_cache_base_url: Optional[str] = None
-
-    def get_raw_config(self) -> Dict[str, Any]:
-        """Get raw configuration dictionary (matching legacy structure)"""
-        return self._settings.to_legacy_dict()
+        # Static settings: never overridden at runtime, so kept as plain attributes
+        self.flow_labs_base_url: str = settings.FLOW_LABS_BASE_URL
+        self.flow_api_base_url: str = settings.FLOW_API_BASE_URL
+        self.flow_timeout: int = settings.FLOW_TIMEOUT
+        self.flow_max_retries: int = settings.FLOW_MAX_RETRIES
+        self.poll_interval: float = settings.FLOW_POLL_INTERVAL
+        self.max_poll_attempts: int = settings.FLOW_MAX_POLL_ATTEMPTS
+        self.server_host: str = settings.SERVER_HOST
+        self.server_port: int = settings.SERVER_PORT
+        self.storage_backend: str = settings.STORAGE_BACKEND
+        self.s3_bucket_name: Optional[str] = settings.S3_BUCKET_NAME
+        self.s3_region_name: Optional[str] = settings.S3_REGION_NAME
+        self.s3_endpoint_url: Optional[str] = settings.S3_ENDPOINT_URL
+        self.s3_access_key: Optional[str] = settings.S3_ACCESS_KEY
+        self.s3_secret_key: Optional[str] = settings.S3_SECRET_KEY
+        self.s3_public_domain: Optional[str] = settings.S3_PUBLIC_DOMAIN
+        self.database_url: Optional[str] = settings.DATABASE_URL
+        self.db_pool_size: int = settings.DB_POOL_SIZE
+        self.db_max_overflow: int = settings.DB_MAX_OVERFLOW
+        self.db_pool_recycle: int = settings.DB_POOL_RECYCLE
+        self.cache_hash_algo: str = settings.CACHE_HASH_ALGO
+
+        # Overridable settings: effective values are recomputed by _set_override
+        # whenever a DB override arrives, so reads are plain attribute loads
+        for name, field in self._OVERRIDES.items():
+            setattr(self, name, getattr(settings, field))
+
+        # Frozen legacy view of the effective config, rebuilt after an override changes
+        self._raw_cache: Optional[Mapping[str, Mapping[str, Any]]] = None
+
+    def get_raw_config(self) -> Mapping[str, Mapping[str, Any]]:
+        """Get read-only configuration mapping (matching legacy structure) with DB overrides applied"""
+        if self._raw_cache is None:
+            raw = self._settings.to_legacy_dict()
+            overridden = {field: name for name, field in self._OVERRIDES.items()}
+            for section, key, field in _TOML_FIELDS:
+                if field in overridden:
+                    raw[section][key] = getattr(self, overridden[field])
+            self._raw_cache = MappingProxyType(
+                {section: MappingProxyType(values) for section, values in raw.items()}
+            )
+        return self._raw_cache
 
     # Helpers
-    def _get_effective_value(self, env_key: str, db_value: Any, settings_value: Any) -> Any:
+    def _set_override(self, name: str, db_value: Any):
         """
-        Determine effective value:
-        1. Env Var (Locked) - checked via os.environ to distinguish from default
+        Apply a DB override for `name`. Effective value is resolved here, once per write:
+        1. Env Var (Locked) - the value seeded from settings stays in place
         2. DB Override
         3. Settings Value (which includes TOML/Default)
         """
-        # If env var is explicitly set, use it (ignoring DB)
-        # Note: settings_value already contains the env var value if set,
-        # but we check os.environ to decide priority against DB.
-        if os.getenv(env_key) is not None:
-             return settings_value
-        
-        if db_value is not None:
-            return db_value
-            
-        return settings_value
-
-    @property
-    def admin_username(self) -> str:
-        return self._get_effective_value("ADMIN_USERNAME", self._db_admin_username, self._settings.ADMIN_USERNAME)
-
-    @admin_username.setter
-    def admin_username(self, value: str):
-        self._db_admin_username = value
+        field = self._OVERRIDES[name]
+        if field in self._locked_envs:
+            return
+        setattr(self, name, getattr(self._settings, field) if db_value is None else db_value)
+        self._raw_cache = None
 
+    # Admin
     def set_admin_username_from_db(self, username: str):
-        self._db_admin_username = username
-
-    @property
-    def admin_password(self) -> str:
-        return self._get_effective_value("ADMIN_PASSWORD", self._db_admin_password, self._settings.ADMIN_PASSWORD)
+        self._set_override("admin_username", username)
 
-    @admin_password.setter
-    def admin_password(self, value: str):
-        self._db_admin_password = value
-    
     def set_admin_password_from_db(self, password: str):
-        self._db_admin_password = password
+        self._set_override("admin_password", password)
 
-    @property
-    def api_key(self) -> str:
-        return self._get_effective_value("API_KEY", self._db_api_key, self._settings.API_KEY)
-        
-    @api_key.setter
-    def api_key(self, value: str):
-        self._db_api_key = value
+    def set_api_key_from_db(self, api_key: str):
+        self._set_override("api_key", api_key)
 
-    # Flow properties
-    @property
-    def flow_labs_base_url(self) -> str:
-        return self._settings.FLOW_LABS_BASE_URL
-        
-    @property
-    def flow_api_base_url(self) -> str:
-        return self._settings.FLOW_API_BASE_URL
-        
-    @property
-    def flow_timeout(self) -> int:
-        return self._settings.FLOW_TIMEOUT
-        
-    @property
-    def flow_max_retries(self) -> int:
-        return self._settings.FLOW_MAX_RETRIES
-
-    @property
-    def poll_interval(self) -> float:
-        return self._settings.FLOW_POLL_INTERVAL
-
-    @property
-    def max_poll_attempts(self) -> int:
-        return self._settings.FLOW_MAX_POLL_ATTEMPTS
-
-    # Server
-    @property
-    def server_host(self) -> str:
-        return self._settings.SERVER_HOST
-
-    @property
-    def server_port(self) -> int:
-        return self._settings.SERVER_PORT
+    def set_error_ban_threshold(self, threshold: int):
+        self._set_override("error_ban_threshold", threshold)
 
     # Debug
-    @property
-    def debug_enabled(self) -> bool:
-        return self._get_effective_value("DEBUG_ENABLED", self._db_debug_enabled, self._settings.DEBUG_ENABLED)
-
     def set_debug_enabled(self, enabled: bool):
-        self._db_debug_enabled = enabled
+        self._set_override("debug_enabled", enabled)
 
-    @property
-    def debug_log_requests(self) -> bool:
-        return self._get_effective_value("DEBUG_LOG_REQUESTS", self._db_debug_log_requests, self._settings.DEBUG_LOG_REQUESTS)
-        
     def set_debug_log_requests(self, enabled: bool):
-        self._db_debug_log_requests = enabled
-
-    @property
-    def debug_log_responses(self) -> bool:
-        return self._get_effective_value("DEBUG_LOG_RESPONSES", self._db_debug_log_responses, self._settings.DEBUG_LOG_RESPONSES)
+        self._set_override("debug_log_requests", enabled)
 
     def set_debug_log_responses(self, enabled: bool):
-        self._db_debug_log_responses = enabled
-
-    @property
-    def debug_mask_token(self) -> bool:
-        return self._get_effective_value("DEBUG_MASK_TOKEN", self._db_debug_mask_token, self._settings.DEBUG_MASK_TOKEN)
+        self._set_override("debug_log_responses", enabled)
 
     def set_debug_mask_token(self, enabled: bool):
-        self._db_debug_mask_token = enabled
+        self._set_override("debug_mask_token", enabled)
 
     # Proxy
-    @property
-    def proxy_enabled(self) -> bool:
-        return self._get_effective_value("PROXY_ENABLED", self._db_proxy_enabled, self._settings.PROXY_ENABLED)
-
     def set_proxy_enabled(self, enabled: bool):
-        self._db_proxy_enabled = enabled
-
-    @property
-    def proxy_url(self) -> str:
-        return self._get_effective_value("PROXY_URL", self._db_proxy_url, self._settings.PROXY_URL)
+        self._set_override("proxy_enabled", enabled)
 
     def set_proxy_url(self, url: str):
-        self._db_proxy_url = url
+        self._set_override("proxy_url", url)
 
     # Generation
-    @property
-    def image_timeout(self) -> int:
-        return self._get_effective_value("GENERATION_IMAGE_TIMEOUT", self._db_image_timeout, self._settings.GENERATION_IMAGE_TIMEOUT)
-
     def set_image_timeout(self, timeout: int):
-        self._db_image_timeout = timeout
-
-    @property
-    def video_timeout(self) -> int:
-        return self._get_effective_value("GENERATION_VIDEO_TIMEOUT", self._db_video_timeout, self._settings.GENERATION_VIDEO_TIMEOUT)
+        self._set_override("image_timeout", timeout)
 
     def set_video_timeout(self, timeout: int):
-        self._db_video_timeout = timeout
-
-    # Admin
-    @property
-    def error_ban_threshold(self) -> int:
-        return self._get_effective_value("ADMIN_ERROR_BAN_THRESHOLD", self._db_error_ban_threshold, self._settings.ADMIN_ERROR_BAN_THRESHOLD)
-
-    def set_error_ban_threshold(self, threshold: int):
-        self._db_error_ban_threshold = threshold
+        self._set_override("video_timeout", timeout)
 
     # Cache
-    @property
-    def cache_enabled(self) -> bool:
-        return self._get_effective_value("CACHE_ENABLED", self._db_cache_enabled, self._settings.CACHE_ENABLED)
-
     def set_cache_enabled(self, enabled: bool):
-        self._db_cache_enabled = enabled
-
-    @property
-    def cache_timeout(self) -> int:
-        return self._get_effective_value("CACHE_TIMEOUT", self._db_cache_timeout, self._settings.CACHE_TIMEOUT)
+        self._set_override("cache_enabled", enabled)
 
     def set_cache_timeout(self, timeout: int):
-        self._db_cache_timeout = timeout
-
-    @property
-    def cache_base_url(self) -> str:
-        return self._get_effective_value("CACHE_BASE_URL", self._db_cache_base_url, self._settings.CACHE_BASE_URL)
+        self._set_override("cache_timeout", timeout)
 
     def set_cache_base_url(self, url: str):
-        self._db_cache_base_url = url
+        self._set_override("cache_base_url", url)
 
-    # Storage
-    @property
-    def storage_backend(self) -> str:
-        return self._settings.STORAGE_BACKEND
-        
-    @property
-    def s3_bucket_name(self) -> Optional[str]:
-        return self._settings.S3_BUCKET_NAME
-        
-    @property
-    def s3_region_name(self) -> Optional[str]:
-        return self._settings.S3_REGION_NAME
-        
-    @property
-    def s3_endpoint_url(self) -> Optional[str]:
-        return self._settings.S3_ENDPOINT_URL
-        
-    @property
-    def s3_access_key(self) -> Optional[str]:
-        return self._settings.S3_ACCESS_KEY
-        
-    @property
-    def s3_secret_key(self) -> Optional[str]:
-        return self._settings.S3_SECRET_KEY
-        
-    @property
-    def s3_public_domain(self) -> Optional[str]:
-        return self._settings.S3_PUBLIC_DOMAIN
+    def is_env_locked(self, env_var: str) -> bool:
+        """Check whether a setting is pinned by its environment variable"""
+        return env_var in self._locked_envs
+
+    def get_locked_status(self) -> Mapping[str, bool]:
+        """Get read-only status of which settings are locked by environment variables"""
+        return self._locked_status
 
-    @property
-    def database_url(self) -> Optional[str]:
-        return self._settings.DATABASE_URL
-        
-    def get_locked_status(self) -> Dict[str, bool]:
-        """Get status of which settings are locked by environment variables"""
-        locked = {}
-        for field_name, field_info in self._settings.model_fields.items():
-            alias = field_info.validation_alias
-            env_var = None
-            if isinstance(alias, AliasChoices):
-                # We assume the second choice is the env var as per our definition
-                if len(alias.choices) > 1:
-                    env_var = alias.choices[1]
-            elif isinstance(alias, str):
-                env_var = alias
-            
-            if env_var:
-                locked[env_var] = self._is_locked(env_var)
-        return locked
-        
-    def _is_locked(self, env_var: str) -> bool:
-        return env_var in os.environ
 
 config = Config()
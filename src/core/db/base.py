@@ -1,11 +1,73 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional, List, Any, Dict
+from datetime import datetime
+from typing import Optional, List, Any, Dict, AsyncIterator, Tuple
 from ..models import (
     Token, TokenStats, Task, RequestLog, 
     AdminConfig, ProxyConfig, GenerationConfig, 
     CacheConfig, DebugConfig, Project
 )
 
+try:
+    import orjson
+
+    def dump_json(value: Any) -> str:
+        """Serialize a JSON column value (orjson when available)"""
+        return orjson.dumps(value).decode()
+
+    load_json = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib codec
+    import json
+
+    def dump_json(value: Any) -> str:
+        """Serialize a JSON column value (UTF-8 kept as-is, like orjson)"""
+        return json.dumps(value, ensure_ascii=False)
+
+    load_json = json.loads
+
+# Schema version stamped into the database once check_and_migrate_db has run against it.
+# Bump it with every migration added to either adapter's check_and_migrate_db
+SCHEMA_VERSION = 1
+
+# Default config row values, keyed like the setting.toml sections
+CONFIG_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "global": {"admin_username": "admin", "admin_password": "admin", "api_key": "han1234"},
+    "admin": {"error_ban_threshold": 3},
+    "proxy": {"proxy_enabled": False, "proxy_url": ""},
+    "generation": {"image_timeout": 300, "video_timeout": 1500},
+    "cache": {"enabled": False, "timeout": 7200, "base_url": ""},
+    "debug": {"enabled": False, "log_requests": True, "log_responses": True, "mask_token": True},
+}
+
+
+def merge_config_defaults(config_dict: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Overlay config_dict (setting.toml structure) on CONFIG_DEFAULTS in one pass"""
+    if not config_dict:
+        # Fresh copies: callers may edit the result without touching the shared defaults
+        return {section: dict(defaults) for section, defaults in CONFIG_DEFAULTS.items()}
+    return {
+        section: {**defaults, **{k: v for k, v in config_dict.get(section, {}).items() if k in defaults}}
+        for section, defaults in CONFIG_DEFAULTS.items()
+    }
+
+# Columns callers may set through update_token / update_task / update_admin_config
+TOKEN_UPDATE_COLUMNS = frozenset(Token.model_fields) - {"id"}
+TASK_UPDATE_COLUMNS = frozenset(Task.model_fields) - {"id", "task_id"}
+ADMIN_CONFIG_UPDATE_COLUMNS = frozenset(AdminConfig.model_fields) - {"id"}
+
+
+def update_fields(kwargs: Dict[str, Any], allowed: frozenset) -> Dict[str, Any]:
+    """Drop None values and return the rest sorted by column, rejecting unknown columns
+
+    Sorting makes every call with the same column set produce identical SQL text,
+    so the statement and its prepared plan are reused.
+    """
+    unknown = kwargs.keys() - allowed
+    if unknown:
+        raise ValueError(f"Unknown column(s) for update: {', '.join(sorted(unknown))}")
+    return {key: kwargs[key] for key in sorted(kwargs) if kwargs[key] is not None}
+
+
 class DatabaseAdapter(ABC):
     """Abstract base class for database adapters"""
 
@@ -20,10 +82,39 @@ class DatabaseAdapter(ABC):
         pass
 
     @abstractmethod
-    async def check_and_migrate_db(self, config_dict: dict = None):
-        """Check database integrity and perform migrations if needed"""
+    async def check_and_migrate_db(self, config_dict: dict = None) -> bool:
+        """Check database integrity and perform migrations if needed
+
+        Returns False if any migration step failed.
+        """
         pass
     
+    @abstractmethod
+    async def get_schema_version(self) -> int:
+        """Get the schema version stamped in the database (0 if never stamped)"""
+        pass
+
+    @abstractmethod
+    async def set_schema_version(self, version: int):
+        """Stamp the schema version in the database"""
+        pass
+
+    async def migrate_if_needed(self, config_dict: dict = None) -> bool:
+        """Run check_and_migrate_db unless the database is already at SCHEMA_VERSION
+
+        Missing config rows are repaired either way. The version is only stamped when every
+        migration step succeeded, so a failed step is retried on the next startup.
+        Returns True if the migration check ran.
+        """
+        if await self.get_schema_version() >= SCHEMA_VERSION:
+            await self.init_config_from_toml(config_dict, is_first_startup=False)
+            return False
+        if await self.check_and_migrate_db(config_dict):
+            await self.set_schema_version(SCHEMA_VERSION)
+        else:
+            print("⚠ Some migration steps failed; schema version left unstamped, will retry on next startup")
+        return True
+
     @abstractmethod
     async def init_config_from_toml(self, config_dict: dict, is_first_startup: bool = True):
         """Initialize database configuration from setting.toml"""
@@ -51,6 +142,11 @@ class DatabaseAdapter(ABC):
     async def get_all_tokens(self) -> List[Token]:
         pass
 
+    async def iter_all_tokens(self) -> AsyncIterator[Token]:
+        """Iterate all tokens; adapters that support cursors override this to stream"""
+        for token in await self.get_all_tokens():
+            yield token
+
     @abstractmethod
     async def get_active_tokens(self) -> List[Token]:
         pass
@@ -119,6 +215,18 @@ class DatabaseAdapter(ABC):
         pass
 
     # Config operations
+    async def get_all_config(self) -> Tuple[Optional[AdminConfig], Optional[ProxyConfig], Optional[GenerationConfig],
+                                            CacheConfig, Optional[DebugConfig]]:
+        """Get admin, proxy, generation, cache and debug config; adapters may fetch these in one round-trip"""
+        # Independent reads: issue them concurrently rather than one after another
+        return tuple(await asyncio.gather(
+            self.get_admin_config(),
+            self.get_proxy_config(),
+            self.get_generation_config(),
+            self.get_cache_config(),
+            self.get_debug_config(),
+        ))
+
     @abstractmethod
     async def get_admin_config(self) -> Optional[AdminConfig]:
         pass
@@ -165,5 +273,15 @@ class DatabaseAdapter(ABC):
         pass
 
     @abstractmethod
-    async def get_logs(self, limit: int = 100, token_id: Optional[int] = None):
+    async def get_logs(self, limit: int = 100, token_id: Optional[int] = None,
+                       before: Optional[Tuple[datetime, int]] = None, include_bodies: bool = False):
+        pass
+
+    @abstractmethod
+    async def get_log_detail(self, log_id: int) -> Optional[dict]:
+        pass
+
+    # Lifecycle
+    async def close(self):
+        """Flush buffered writes and release connections at shutdown"""
         pass
@@ -1,293 +1,648 @@
-import json
-from datetime import datetime, date
-from typing import Optional, List, Any
+from collections import Counter
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, List, Any, Dict, Mapping, Tuple, AsyncIterator, Awaitable, Callable
 import asyncio
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
 from sqlalchemy.engine import Result
 
+from ..logger import debug_logger
 from ..models import (
     Token, TokenStats, Task, RequestLog, 
     AdminConfig, ProxyConfig, GenerationConfig, 
     CacheConfig, Project, DebugConfig
 )
-from .base import DatabaseAdapter
+from .base import (
+    DatabaseAdapter, merge_config_defaults, update_fields, dump_json, load_json,
+    TOKEN_UPDATE_COLUMNS, TASK_UPDATE_COLUMNS, ADMIN_CONFIG_UPDATE_COLUMNS
+)
+
+
+@lru_cache(maxsize=128)
+def _update_sql(table: str, columns: Tuple[str, ...], where: str, touch_updated_at: bool = False) -> TextClause:
+    """Build the UPDATE statement for one combination of columns (cached per combination)"""
+    updates = [f"{column} = :{column}" for column in columns]
+    if touch_updated_at:
+        updates.append("updated_at = CURRENT_TIMESTAMP")
+    return text(f"UPDATE {table} SET {', '.join(updates)} WHERE {where}")
+
+_SCHEMA_DDL = """
+-- Tokens table
+CREATE TABLE IF NOT EXISTS tokens (
+    id SERIAL PRIMARY KEY,
+    st TEXT UNIQUE NOT NULL,
+    at TEXT,
+    at_expires TIMESTAMP,
+    email TEXT NOT NULL,
+    name TEXT,
+    remark TEXT,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP,
+    use_count INTEGER DEFAULT 0,
+    credits INTEGER DEFAULT 0,
+    user_paygate_tier TEXT,
+    current_project_id TEXT,
+    current_project_name TEXT,
+    image_enabled BOOLEAN DEFAULT TRUE,
+    video_enabled BOOLEAN DEFAULT TRUE,
+    image_concurrency INTEGER DEFAULT -1,
+    video_concurrency INTEGER DEFAULT -1
+);
+
+-- Projects table
+CREATE TABLE IF NOT EXISTS projects (
+    id SERIAL PRIMARY KEY,
+    project_id TEXT UNIQUE NOT NULL,
+    token_id INTEGER NOT NULL REFERENCES tokens(id) ON DELETE CASCADE,
+    project_name TEXT NOT NULL,
+    tool_name TEXT DEFAULT 'PINHOLE',
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Token stats table
+CREATE TABLE IF NOT EXISTS token_stats (
+    id SERIAL PRIMARY KEY,
+    token_id INTEGER NOT NULL REFERENCES tokens(id) ON DELETE CASCADE,
+    image_count INTEGER DEFAULT 0,
+    video_count INTEGER DEFAULT 0,
+    success_count INTEGER DEFAULT 0,
+    error_count INTEGER DEFAULT 0,
+    last_success_at TIMESTAMP,
+    last_error_at TIMESTAMP,
+    today_image_count INTEGER DEFAULT 0,
+    today_video_count INTEGER DEFAULT 0,
+    today_error_count INTEGER DEFAULT 0,
+    today_date DATE,
+    consecutive_error_count INTEGER DEFAULT 0
+);
+
+-- Tasks table
+CREATE TABLE IF NOT EXISTS tasks (
+    id SERIAL PRIMARY KEY,
+    task_id TEXT UNIQUE NOT NULL,
+    token_id INTEGER NOT NULL REFERENCES tokens(id),
+    model TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'processing',
+    progress INTEGER DEFAULT 0,
+    result_urls JSONB,
+    error_message TEXT,
+    scene_id TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+-- Request logs table
+CREATE TABLE IF NOT EXISTS request_logs (
+    id SERIAL PRIMARY KEY,
+    token_id INTEGER REFERENCES tokens(id),
+    operation TEXT NOT NULL,
+    request_body TEXT,
+    response_body TEXT,
+    status_code INTEGER NOT NULL,
+    duration FLOAT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Admin config table
+CREATE TABLE IF NOT EXISTS admin_config (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    username TEXT DEFAULT 'admin',
+    password TEXT DEFAULT 'admin',
+    api_key TEXT DEFAULT 'han1234',
+    error_ban_threshold INTEGER DEFAULT 3,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Proxy config table
+CREATE TABLE IF NOT EXISTS proxy_config (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    enabled BOOLEAN DEFAULT FALSE,
+    proxy_url TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Generation config table
+CREATE TABLE IF NOT EXISTS generation_config (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    image_timeout INTEGER DEFAULT 300,
+    video_timeout INTEGER DEFAULT 1500,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Cache config table
+CREATE TABLE IF NOT EXISTS cache_config (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    cache_enabled BOOLEAN DEFAULT FALSE,
+    cache_timeout INTEGER DEFAULT 7200,
+    cache_base_url TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Debug config table
+CREATE TABLE IF NOT EXISTS debug_config (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    enabled BOOLEAN DEFAULT FALSE,
+    log_requests BOOLEAN DEFAULT TRUE,
+    log_responses BOOLEAN DEFAULT TRUE,
+    mask_token BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Schema version the migration check last brought this database to
+CREATE TABLE IF NOT EXISTS schema_version (
+    id INTEGER PRIMARY KEY DEFAULT 1,
+    version INTEGER NOT NULL
+);
+"""
+
+# Daily counters restart when today_date is not the server's CURRENT_DATE (including NULL),
+# so no date parameter is shipped. Image/video increments are coalesced and add :n at once
+_INCREMENT_IMAGE_SQL = text("""
+    UPDATE token_stats
+    SET image_count = image_count + :n,
+        today_image_count = CASE WHEN today_date = CURRENT_DATE THEN today_image_count + :n ELSE :n END,
+        today_date = CURRENT_DATE
+    WHERE token_id = :tid
+""")
+
+_INCREMENT_VIDEO_SQL = text("""
+    UPDATE token_stats
+    SET video_count = video_count + :n,
+        today_video_count = CASE WHEN today_date = CURRENT_DATE THEN today_video_count + :n ELSE :n END,
+        today_date = CURRENT_DATE
+    WHERE token_id = :tid
+""")
+
+_INCREMENT_ERROR_SQL = text("""
+    UPDATE token_stats
+    SET error_count = error_count + 1,
+        consecutive_error_count = consecutive_error_count + 1,
+        today_error_count = CASE WHEN today_date = CURRENT_DATE THEN today_error_count + 1 ELSE 1 END,
+        today_date = CURRENT_DATE,
+        last_error_at = CURRENT_TIMESTAMP
+    WHERE token_id = :tid
+""")
+
+# Explicit column lists matching the models; rows from our own schema are trusted, so the
+# accessors below build models with model_construct and skip re-validation
+_TOKEN_COLUMNS = ", ".join(Token.model_fields)
+_PROJECT_COLUMNS = ", ".join(Project.model_fields)
+_TASK_COLUMNS = ", ".join(Task.model_fields)
+
+# Remaining static statements, likewise built once
+_DELETE_TOKEN_SQL = text("DELETE FROM tokens WHERE id = :id")
+
+_ADD_PROJECT_SQL = text("""
+    INSERT INTO projects (project_id, token_id, project_name, tool_name, is_active)
+    VALUES (:project_id, :token_id, :project_name, :tool_name, :is_active)
+    RETURNING id
+""")
+
+_DELETE_PROJECT_SQL = text("DELETE FROM projects WHERE project_id = :pid")
+
+_CREATE_TASK_SQL = text("""
+    INSERT INTO tasks (task_id, token_id, model, prompt, status, progress, scene_id, result_urls, error_message)
+    VALUES (:task_id, :token_id, :model, :prompt, :status, :progress, :scene_id, :result_urls, :error_message)
+    RETURNING id
+""")
+
+_GET_ADMIN_CONFIG_SQL = text("SELECT * FROM admin_config WHERE id = 1")
+_GET_PROXY_CONFIG_SQL = text("SELECT * FROM proxy_config WHERE id = 1")
+
+_UPDATE_PROXY_CONFIG_SQL = text("""
+    UPDATE proxy_config
+    SET enabled = :enabled, proxy_url = :url, updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1
+""")
+
+_GET_GENERATION_CONFIG_SQL = text("SELECT * FROM generation_config WHERE id = 1")
+
+_UPDATE_GENERATION_CONFIG_SQL = text("""
+    UPDATE generation_config
+    SET image_timeout = :it, video_timeout = :vt, updated_at = CURRENT_TIMESTAMP
+    WHERE id = 1
+""")
+
+_GET_CACHE_CONFIG_SQL = text("SELECT * FROM cache_config WHERE id = 1")
+_GET_DEBUG_CONFIG_SQL = text("SELECT * FROM debug_config WHERE id = 1")
+
+_ADD_REQUEST_LOG_SQL = text("""
+    INSERT INTO request_logs (token_id, operation, request_body, response_body, status_code, duration)
+    VALUES (:token_id, :operation, :request_body, :response_body, :status_code, :duration)
+""")
+
+
+@lru_cache(maxsize=None)
+def _logs_sql(by_token: bool, keyset: bool, include_bodies: bool) -> TextClause:
+    """Build the get_logs query; pages are keyset-paginated on (created_at, id), newest first"""
+    # The request/response bodies can be many KB each; list views leave them out
+    bodies = "rl.request_body, rl.response_body," if include_bodies else ""
+    conditions = []
+    if by_token:
+        conditions.append("rl.token_id = :tid")
+    if keyset:
+        conditions.append("(rl.created_at, rl.id) < (CAST(:bts AS TIMESTAMP), CAST(:bid AS INTEGER))")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return text(f"""
+        SELECT
+            rl.id,
+            rl.token_id,
+            rl.operation,
+            {bodies}
+            rl.status_code,
+            rl.duration,
+            rl.created_at,
+            t.email as token_email,
+            t.name as token_username
+        FROM request_logs rl
+        LEFT JOIN tokens t ON rl.token_id = t.id
+        {where}
+        ORDER BY rl.created_at DESC, rl.id DESC
+        LIMIT :limit
+    """)
+
+_GET_LOG_DETAIL_SQL = text("""
+    SELECT
+        rl.id,
+        rl.token_id,
+        rl.operation,
+        rl.request_body,
+        rl.response_body,
+        rl.status_code,
+        rl.duration,
+        rl.created_at,
+        t.email as token_email,
+        t.name as token_username
+    FROM request_logs rl
+    LEFT JOIN tokens t ON rl.token_id = t.id
+    WHERE rl.id = :id
+""")
+
+# Single-row config tables in get_all_config order, and the fallbacks used when a row is missing
+_CONFIG_ROW_MODELS = (
+    ("admin_config", AdminConfig),
+    ("proxy_config", ProxyConfig),
+    ("generation_config", GenerationConfig),
+    ("cache_config", CacheConfig),
+    ("debug_config", DebugConfig),
+)
+_CONFIG_ROW_DEFAULTS = {
+    "cache_config": lambda: CacheConfig(cache_enabled=False, cache_timeout=7200),
+    "debug_config": lambda: DebugConfig(enabled=False, log_requests=True, log_responses=True, mask_token=True),
+}
+
+# One row, one JSON column per config table (the driver's json codec decodes each to a dict)
+_GET_ALL_CONFIG_SQL = text("SELECT " + ", ".join(
+    f"(SELECT row_to_json(c) FROM {table} c WHERE id = 1) AS {table}" for table, _ in _CONFIG_ROW_MODELS
+))
+
+# Partial config writes merged server-side: a NULL parameter keeps the current value
+# (or the column default when the row is missing)
+_UPSERT_CACHE_CONFIG_SQL = text("""
+    INSERT INTO cache_config (id, cache_enabled, cache_timeout, cache_base_url)
+    VALUES (1, COALESCE(:e, FALSE), COALESCE(:t, 7200), :u)
+    ON CONFLICT (id) DO UPDATE SET
+        cache_enabled = COALESCE(:e, cache_config.cache_enabled),
+        cache_timeout = COALESCE(:t, cache_config.cache_timeout),
+        cache_base_url = CASE WHEN :u_set THEN EXCLUDED.cache_base_url ELSE cache_config.cache_base_url END,
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+_UPSERT_DEBUG_CONFIG_SQL = text("""
+    INSERT INTO debug_config (id, enabled, log_requests, log_responses, mask_token)
+    VALUES (1, COALESCE(:e, FALSE), COALESCE(:lr, TRUE), COALESCE(:lrs, TRUE), COALESCE(:m, TRUE))
+    ON CONFLICT (id) DO UPDATE SET
+        enabled = COALESCE(:e, debug_config.enabled),
+        log_requests = COALESCE(:lr, debug_config.log_requests),
+        log_responses = COALESCE(:lrs, debug_config.log_responses),
+        mask_token = COALESCE(:m, debug_config.mask_token),
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+# Columns written when creating a token; everything else takes its column default
+_TOKEN_INSERT_COLUMNS = (
+    "st", "at", "at_expires", "email", "name", "remark", "is_active",
+    "credits", "user_paygate_tier", "current_project_id", "current_project_name",
+    "image_enabled", "video_enabled", "image_concurrency", "video_concurrency",
+)
+
+_ADD_TOKEN_SQL = text(f"""
+    WITH new_token AS (
+        INSERT INTO tokens ({", ".join(_TOKEN_INSERT_COLUMNS)})
+        VALUES ({", ".join(":" + column for column in _TOKEN_INSERT_COLUMNS)})
+        RETURNING id
+    )
+    INSERT INTO token_stats (token_id) SELECT id FROM new_token
+    RETURNING token_id
+""")
+
+# Hot-path statements, parsed once at import rather than per call
+_GET_TOKEN_SQL = text(f"SELECT {_TOKEN_COLUMNS} FROM tokens WHERE id = :id")
+_GET_TOKEN_BY_ST_SQL = text(f"SELECT {_TOKEN_COLUMNS} FROM tokens WHERE st = :st")
+_ALL_TOKENS_SQL = text(f"SELECT {_TOKEN_COLUMNS} FROM tokens ORDER BY created_at DESC")
+_ACTIVE_TOKENS_SQL = text(f"SELECT {_TOKEN_COLUMNS} FROM tokens WHERE is_active = TRUE ORDER BY last_used_at ASC")
+_GET_PROJECT_SQL = text(f"SELECT {_PROJECT_COLUMNS} FROM projects WHERE project_id = :pid")
+_PROJECTS_BY_TOKEN_SQL = text(f"SELECT {_PROJECT_COLUMNS} FROM projects WHERE token_id = :tid ORDER BY created_at DESC")
+_GET_TASK_SQL = text(f"SELECT {_TASK_COLUMNS} FROM tasks WHERE task_id = :tid")
+_GET_TOKEN_STATS_SQL = text("SELECT * FROM token_stats WHERE token_id = :tid")
+_RESET_ERROR_SQL = text("UPDATE token_stats SET consecutive_error_count = 0 WHERE token_id = :tid")
+_GET_SCHEMA_VERSION_SQL = text("SELECT version FROM schema_version WHERE id = 1")
+_SET_SCHEMA_VERSION_SQL = text(
+    "INSERT INTO schema_version (id, version) VALUES (1, :version) "
+    "ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version"
+)
+
+# How long a write buffer keeps collecting items before flushing them in one transaction
+_FLUSH_WINDOW = 0.05
+_FLUSH_MAX_BATCH = 500
+# Serverless instances are frozen or killed between invocations without a shutdown hook,
+# so nothing may sit in a buffer there
+_WRITE_THROUGH = bool(os.getenv("VERCEL"))
+
+# Request log batches at least this large are written with COPY; below it the setup isn't amortised
+_COPY_MIN_ROWS = 100
+_REQUEST_LOG_COLUMNS = ("token_id", "operation", "request_body", "response_body", "status_code", "duration")
+
+# Seconds a config row read stays cached in-process
+_CONFIG_CACHE_TTL = 15
+
+# Rows fetched per round-trip when streaming through a server-side cursor
+_STREAM_CHUNK = 500
+
+# Built concurrently, outside any transaction, so existing deployments keep serving while they build
+_CONCURRENT_INDEXES = (
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_task_id ON tasks(task_id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_token_st ON tokens(st)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_project_id ON projects(project_id)",
+    # get_active_tokens: WHERE is_active ORDER BY last_used_at
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tokens_active_last_used ON tokens (last_used_at) WHERE is_active",
+    # get_logs keyset pages, with and without a token filter
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_request_logs_created ON request_logs (created_at DESC, id DESC)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_request_logs_token_created ON request_logs (token_id, created_at DESC, id DESC)",
+)
+
+def _asyncpg_url(db_url: str) -> str:
+    """Point plain postgres:// / postgresql:// URLs at the asyncpg driver"""
+    for prefix in ("postgres://", "postgresql://"):
+        if db_url.startswith(prefix):
+            return "postgresql+asyncpg://" + db_url[len(prefix):]
+    return db_url
+
+def _request_log_params(log: RequestLog) -> Dict[str, Any]:
+    return {
+        "token_id": log.token_id,
+        "operation": log.operation,
+        "request_body": log.request_body,
+        "response_body": log.response_body,
+        "status_code": log.status_code,
+        "duration": log.duration
+    }
+
+
+class _WriteBuffer:
+    """Collects off-request-path writes and hands them to flush() in batches from a background task
+
+    Trade-off: items are only in memory until their batch is written (up to _FLUSH_WINDOW plus
+    the write itself). close() drains them on a graceful shutdown, but a crash or SIGKILL loses
+    whatever is still queued. Only use it for bookkeeping that can tolerate that; on Vercel
+    (_WRITE_THROUGH) put() writes each item straight away instead.
+    """
+
+    def __init__(self, flush: Callable[[list], Awaitable[None]], what: str,
+                 fallback: Optional[Callable[[Any], Awaitable[None]]] = None):
+        self._flush = flush
+        self._what = what
+        # Writes one item on its own when its batch fails, so one bad row doesn't sink the rest
+        self._fallback = fallback
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        # Items put() but not yet through _flush/_recover; lets flush() return at once when idle
+        self._unflushed = 0
+
+    async def put(self, item):
+        if _WRITE_THROUGH:
+            try:
+                await self._flush([item])
+            except Exception as e:
+                await self._recover([item], e)
+            return
+        self._unflushed += 1
+        self._queue.put_nowait(item)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        # A None item is the stop signal from close(); everything queued before it is flushed.
+        # A Future is a flush() waiter, resolved once everything queued before it is written
+        queue = self._queue
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if isinstance(item, asyncio.Future):
+                if not item.done():
+                    item.set_result(None)
+                continue
+            await asyncio.sleep(_FLUSH_WINDOW)
+            batch = [item]
+            stop = False
+            waiter = None
+            while len(batch) < _FLUSH_MAX_BATCH and not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, asyncio.Future):
+                    waiter = item
+                    break
+                batch.append(item)
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                await self._recover(batch, e)
+            self._unflushed -= len(batch)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+            if stop:
+                return
+
+    async def _recover(self, batch: list, error: Exception):
+        lost = len(batch)
+        if self._fallback is not None:
+            for item in batch:
+                try:
+                    await self._fallback(item)
+                    lost -= 1
+                except Exception as e:
+                    error = e
+        if lost:
+            message = f"Dropped {lost} of {len(batch)} buffered {self._what}: {error}"
+            print(f"  ⚠️ {message}")
+            debug_logger.log_error(message)
+
+    async def flush(self):
+        """Wait until every item put() so far has been written (read-your-writes for callers)"""
+        if not self._unflushed or self._worker is None or self._worker.done():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(waiter)
+        await waiter
+
+    async def close(self):
+        if self._worker is not None and not self._worker.done():
+            self._queue.put_nowait(None)
+            await self._worker
+
 
 class PostgresAdapter(DatabaseAdapter):
     """Postgres database manager using SQLAlchemy"""
 
-    def __init__(self, db_url: str):
-        self.engine = create_async_engine(db_url)
+    def __init__(self, db_url: str, pool_size: int = 20, max_overflow: int = 10, pool_recycle: int = 1800):
+        self.engine = create_async_engine(
+            _asyncpg_url(db_url),
+            # Sized for concurrent generation requests rather than the default 5 + 10
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=True,
+            pool_recycle=pool_recycle,
+            pool_use_lifo=True,
+            # Short OLTP queries only; JIT compilation costs more than it saves here
+            connect_args={"server_settings": {"jit": "off"}},
+            # Used by the driver's json/jsonb codec, e.g. when reading tasks.result_urls
+            json_deserializer=load_json,
+        )
+        # Plain reads and single-statement writes share the pool but run in AUTOCOMMIT,
+        # skipping the BEGIN/COMMIT (or ROLLBACK) round-trips around a lone statement
+        self._autocommit_engine = self.engine.execution_options(isolation_level="AUTOCOMMIT")
+        # Schema objects only ever get added, so a positive existence check stays valid
+        self._known_tables: set = set()
+        self._known_columns: set = set()
+        # Bookkeeping writes kept off the request path: (token_id, stat_type) image/video
+        # increments and request log rows
+        self._stats_buffer = _WriteBuffer(self._flush_stats, "token stats")
+        self._log_buffer = _WriteBuffer(self._flush_logs, "request logs", fallback=self._insert_log)
+        # Config rows rarely change and are read on hot paths (proxy lookup, error ban check);
+        # this process's own writes invalidate immediately, other workers see them within the TTL
+        self._config_cache: Dict[str, Tuple[float, Any]] = {}
     
     async def is_initialized(self) -> bool:
         """Check if database is initialized (tables exist)"""
-        async with self.engine.connect() as conn:
+        # Once the tokens table has been seen it stays; skip checking out a connection at all
+        if "tokens" in self._known_tables:
+            return True
+        async with self._autocommit_engine.connect() as conn:
             return await self._table_exists(conn, "tokens")
 
     async def init_db(self):
         """Initialize database tables"""
-        async with self.engine.begin() as conn:
-            # Tokens table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS tokens (
-                    id SERIAL PRIMARY KEY,
-                    st TEXT UNIQUE NOT NULL,
-                    at TEXT,
-                    at_expires TIMESTAMP,
-                    email TEXT NOT NULL,
-                    name TEXT,
-                    remark TEXT,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_used_at TIMESTAMP,
-                    use_count INTEGER DEFAULT 0,
-                    credits INTEGER DEFAULT 0,
-                    user_paygate_tier TEXT,
-                    current_project_id TEXT,
-                    current_project_name TEXT,
-                    image_enabled BOOLEAN DEFAULT TRUE,
-                    video_enabled BOOLEAN DEFAULT TRUE,
-                    image_concurrency INTEGER DEFAULT -1,
-                    video_concurrency INTEGER DEFAULT -1
-                )
-            """))
-
-            # Projects table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS projects (
-                    id SERIAL PRIMARY KEY,
-                    project_id TEXT UNIQUE NOT NULL,
-                    token_id INTEGER NOT NULL REFERENCES tokens(id),
-                    project_name TEXT NOT NULL,
-                    tool_name TEXT DEFAULT 'PINHOLE',
-                    is_active BOOLEAN DEFAULT TRUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-
-            # Token stats table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS token_stats (
-                    id SERIAL PRIMARY KEY,
-                    token_id INTEGER NOT NULL REFERENCES tokens(id),
-                    image_count INTEGER DEFAULT 0,
-                    video_count INTEGER DEFAULT 0,
-                    success_count INTEGER DEFAULT 0,
-                    error_count INTEGER DEFAULT 0,
-                    last_success_at TIMESTAMP,
-                    last_error_at TIMESTAMP,
-                    today_image_count INTEGER DEFAULT 0,
-                    today_video_count INTEGER DEFAULT 0,
-                    today_error_count INTEGER DEFAULT 0,
-                    today_date DATE,
-                    consecutive_error_count INTEGER DEFAULT 0
-                )
-            """))
-
-            # Tasks table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id SERIAL PRIMARY KEY,
-                    task_id TEXT UNIQUE NOT NULL,
-                    token_id INTEGER NOT NULL REFERENCES tokens(id),
-                    model TEXT NOT NULL,
-                    prompt TEXT NOT NULL,
-                    status TEXT NOT NULL DEFAULT 'processing',
-                    progress INTEGER DEFAULT 0,
-                    result_urls TEXT,
-                    error_message TEXT,
-                    scene_id TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    completed_at TIMESTAMP
-                )
-            """))
-
-            # Request logs table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS request_logs (
-                    id SERIAL PRIMARY KEY,
-                    token_id INTEGER REFERENCES tokens(id),
-                    operation TEXT NOT NULL,
-                    request_body TEXT,
-                    response_body TEXT,
-                    status_code INTEGER NOT NULL,
-                    duration FLOAT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-
-            # Admin config table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS admin_config (
-                    id INTEGER PRIMARY KEY DEFAULT 1,
-                    username TEXT DEFAULT 'admin',
-                    password TEXT DEFAULT 'admin',
-                    api_key TEXT DEFAULT 'han1234',
-                    error_ban_threshold INTEGER DEFAULT 3,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-
-            # Proxy config table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS proxy_config (
-                    id INTEGER PRIMARY KEY DEFAULT 1,
-                    enabled BOOLEAN DEFAULT FALSE,
-                    proxy_url TEXT,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-
-            # Generation config table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS generation_config (
-                    id INTEGER PRIMARY KEY DEFAULT 1,
-                    image_timeout INTEGER DEFAULT 300,
-                    video_timeout INTEGER DEFAULT 1500,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-
-            # Cache config table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS cache_config (
-                    id INTEGER PRIMARY KEY DEFAULT 1,
-                    cache_enabled BOOLEAN DEFAULT FALSE,
-                    cache_timeout INTEGER DEFAULT 7200,
-                    cache_base_url TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
-
-            # Debug config table
-            await conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS debug_config (
-                    id INTEGER PRIMARY KEY DEFAULT 1,
-                    enabled BOOLEAN DEFAULT FALSE,
-                    log_requests BOOLEAN DEFAULT TRUE,
-                    log_responses BOOLEAN DEFAULT TRUE,
-                    mask_token BOOLEAN DEFAULT TRUE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """))
+        # The whole schema goes out as one multi-statement script over asyncpg's simple query
+        # protocol: a single round-trip, run by Postgres as one implicit transaction
+        async with self.engine.connect() as conn:
+            raw_conn = await conn.get_raw_connection()
+            await raw_conn.driver_connection.execute(_SCHEMA_DDL)
+        self._known_tables.add("tokens")
 
-            # Create indexes
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS idx_task_id ON tasks(task_id)"))
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS idx_token_st ON tokens(st)"))
-            await conn.execute(text("CREATE INDEX IF NOT EXISTS idx_project_id ON projects(project_id)"))
+        await self._create_indexes()
 
     async def _table_exists(self, conn, table_name: str) -> bool:
+        if table_name in self._known_tables:
+            return True
+        # Direct catalog lookup (resolved via search_path) instead of the information_schema views
         result = await conn.execute(text(
-            "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = :table_name)"
+            "SELECT to_regclass(:table_name) IS NOT NULL"
         ), {"table_name": table_name})
-        return result.scalar()
+        exists = result.scalar()
+        if exists:
+            self._known_tables.add(table_name)
+        return exists
 
     async def _column_exists(self, conn, table_name: str, column_name: str) -> bool:
+        if (table_name, column_name) in self._known_columns:
+            return True
         result = await conn.execute(text(
-            "SELECT EXISTS (SELECT FROM information_schema.columns WHERE table_name = :table_name AND column_name = :column_name)"
+            "SELECT EXISTS (SELECT FROM pg_attribute WHERE attrelid = to_regclass(:table_name) "
+            "AND attname = :column_name AND attnum > 0 AND NOT attisdropped)"
         ), {"table_name": table_name, "column_name": column_name})
-        return result.scalar()
+        exists = result.scalar()
+        if exists:
+            self._known_columns.add((table_name, column_name))
+        return exists
+
+    async def _existing_columns(self, conn, table_name: str) -> set:
+        """Fetch every column name of a table in one catalog query"""
+        result = await conn.execute(text(
+            "SELECT attname FROM pg_attribute WHERE attrelid = to_regclass(:table_name) "
+            "AND attnum > 0 AND NOT attisdropped"
+        ), {"table_name": table_name})
+        columns = set(result.scalars().all())
+        self._known_columns.update((table_name, column) for column in columns)
+        return columns
 
     async def _ensure_config_rows(self, conn, config_dict: dict = None):
         """Ensure all config tables have their default rows"""
-        
+        # Each row is inserted only if id = 1 is missing: one statement per table, no COUNT(*) probe
+        defaults = merge_config_defaults(config_dict)
+
         # Admin config
-        result = await conn.execute(text("SELECT COUNT(*) FROM admin_config"))
-        if result.scalar() == 0:
-            admin_username = "admin"
-            admin_password = "admin"
-            api_key = "han1234"
-            error_ban_threshold = 3
-
-            if config_dict:
-                global_config = config_dict.get("global", {})
-                admin_username = global_config.get("admin_username", "admin")
-                admin_password = global_config.get("admin_password", "admin")
-                api_key = global_config.get("api_key", "han1234")
-
-                admin_config = config_dict.get("admin", {})
-                error_ban_threshold = admin_config.get("error_ban_threshold", 3)
-
-            await conn.execute(text("""
-                INSERT INTO admin_config (id, username, password, api_key, error_ban_threshold)
-                VALUES (1, :u, :p, :k, :e)
-            """), {"u": admin_username, "p": admin_password, "k": api_key, "e": error_ban_threshold})
+        global_config = defaults["global"]
+        await conn.execute(text("""
+            INSERT INTO admin_config (id, username, password, api_key, error_ban_threshold)
+            VALUES (1, :u, :p, :k, :e)
+            ON CONFLICT (id) DO NOTHING
+        """), {"u": global_config["admin_username"], "p": global_config["admin_password"],
+               "k": global_config["api_key"], "e": defaults["admin"]["error_ban_threshold"]})
 
         # Proxy config
-        result = await conn.execute(text("SELECT COUNT(*) FROM proxy_config"))
-        if result.scalar() == 0:
-            proxy_enabled = False
-            proxy_url = None
-
-            if config_dict:
-                proxy_config = config_dict.get("proxy", {})
-                proxy_enabled = proxy_config.get("proxy_enabled", False)
-                proxy_url = proxy_config.get("proxy_url", "") or None
-
-            await conn.execute(text("""
-                INSERT INTO proxy_config (id, enabled, proxy_url)
-                VALUES (1, :e, :u)
-            """), {"e": proxy_enabled, "u": proxy_url})
+        proxy_config = defaults["proxy"]
+        await conn.execute(text("""
+            INSERT INTO proxy_config (id, enabled, proxy_url)
+            VALUES (1, :e, :u)
+            ON CONFLICT (id) DO NOTHING
+        """), {"e": proxy_config["proxy_enabled"], "u": proxy_config["proxy_url"] or None})
 
         # Generation config
-        result = await conn.execute(text("SELECT COUNT(*) FROM generation_config"))
-        if result.scalar() == 0:
-            image_timeout = 300
-            video_timeout = 1500
-
-            if config_dict:
-                generation_config = config_dict.get("generation", {})
-                image_timeout = generation_config.get("image_timeout", 300)
-                video_timeout = generation_config.get("video_timeout", 1500)
-
-            await conn.execute(text("""
-                INSERT INTO generation_config (id, image_timeout, video_timeout)
-                VALUES (1, :i, :v)
-            """), {"i": image_timeout, "v": video_timeout})
+        generation_config = defaults["generation"]
+        await conn.execute(text("""
+            INSERT INTO generation_config (id, image_timeout, video_timeout)
+            VALUES (1, :i, :v)
+            ON CONFLICT (id) DO NOTHING
+        """), {"i": generation_config["image_timeout"], "v": generation_config["video_timeout"]})
 
         # Cache config
-        result = await conn.execute(text("SELECT COUNT(*) FROM cache_config"))
-        if result.scalar() == 0:
-            cache_enabled = False
-            cache_timeout = 7200
-            cache_base_url = None
-
-            if config_dict:
-                cache_config = config_dict.get("cache", {})
-                cache_enabled = cache_config.get("enabled", False)
-                cache_timeout = cache_config.get("timeout", 7200)
-                cache_base_url = cache_config.get("base_url", "") or None
-
-            await conn.execute(text("""
-                INSERT INTO cache_config (id, cache_enabled, cache_timeout, cache_base_url)
-                VALUES (1, :e, :t, :u)
-            """), {"e": cache_enabled, "t": cache_timeout, "u": cache_base_url})
+        cache_config = defaults["cache"]
+        await conn.execute(text("""
+            INSERT INTO cache_config (id, cache_enabled, cache_timeout, cache_base_url)
+            VALUES (1, :e, :t, :u)
+            ON CONFLICT (id) DO NOTHING
+        """), {"e": cache_config["enabled"], "t": cache_config["timeout"], "u": cache_config["base_url"] or None})
 
         # Debug config
-        result = await conn.execute(text("SELECT COUNT(*) FROM debug_config"))
-        if result.scalar() == 0:
-            debug_enabled = False
-            log_requests = True
-            log_responses = True
-            mask_token = True
-
-            if config_dict:
-                debug_config = config_dict.get("debug", {})
-                debug_enabled = debug_config.get("enabled", False)
-                log_requests = debug_config.get("log_requests", True)
-                log_responses = debug_config.get("log_responses", True)
-                mask_token = debug_config.get("mask_token", True)
-
-            await conn.execute(text("""
-                INSERT INTO debug_config (id, enabled, log_requests, log_responses, mask_token)
-                VALUES (1, :e, :lr, :lrs, :m)
-            """), {"e": debug_enabled, "lr": log_requests, "lrs": log_responses, "m": mask_token})
-
+        debug_config = defaults["debug"]
+        await conn.execute(text("""
+            INSERT INTO debug_config (id, enabled, log_requests, log_responses, mask_token)
+            VALUES (1, :e, :lr, :lrs, :m)
+            ON CONFLICT (id) DO NOTHING
+        """), {"e": debug_config["enabled"], "lr": debug_config["log_requests"],
+               "lrs": debug_config["log_responses"], "m": debug_config["mask_token"]})
+
+    # Adding a migration below? Bump SCHEMA_VERSION in base.py, or databases already
+    # stamped with the current version will never run it
     async def check_and_migrate_db(self, config_dict: dict = None):
-        """Check database integrity and perform migrations if needed"""
+        """Check database integrity and perform migrations if needed
+
+        Returns False if any migration step failed.
+        """
+        ok = True
         async with self.engine.begin() as conn:
             print("Checking database integrity and performing migrations (Postgres)...")
 
@@ -320,13 +675,15 @@ class PostgresAdapter(DatabaseAdapter):
                     ("video_concurrency", "INTEGER DEFAULT -1"),
                 ]
 
+                existing = await self._existing_columns(conn, "tokens")
                 for col_name, col_type in columns_to_add:
-                    if not await self._column_exists(conn, "tokens", col_name):
+                    if col_name not in existing:
                         try:
                             await conn.execute(text(f"ALTER TABLE tokens ADD COLUMN {col_name} {col_type}"))
                             print(f"  ✓ Added column '{col_name}' to tokens table")
                         except Exception as e:
                             print(f"  ✗ Failed to add column '{col_name}': {e}")
+                            ok = False
 
             # Check and add missing columns to admin_config table
             if await self._table_exists(conn, "admin_config"):
@@ -336,6 +693,7 @@ class PostgresAdapter(DatabaseAdapter):
                         print("  ✓ Added column 'error_ban_threshold' to admin_config table")
                     except Exception as e:
                         print(f"  ✗ Failed to add column 'error_ban_threshold': {e}")
+                        ok = False
             
             # Check and add missing columns to token_stats table
             if await self._table_exists(conn, "token_stats"):
@@ -347,17 +705,94 @@ class PostgresAdapter(DatabaseAdapter):
                     ("consecutive_error_count", "INTEGER DEFAULT 0"),
                 ]
 
+                existing = await self._existing_columns(conn, "token_stats")
                 for col_name, col_type in stats_columns_to_add:
-                    if not await self._column_exists(conn, "token_stats", col_name):
+                    if col_name not in existing:
                         try:
                             await conn.execute(text(f"ALTER TABLE token_stats ADD COLUMN {col_name} {col_type}"))
                             print(f"  ✓ Added column '{col_name}' to token_stats table")
                         except Exception as e:
                             print(f"  ✗ Failed to add column '{col_name}': {e}")
+                            ok = False
+
+            # Convert tasks.result_urls from TEXT to JSONB
+            if await self._table_exists(conn, "tasks"):
+                result = await conn.execute(text(
+                    "SELECT atttypid = 'text'::regtype FROM pg_attribute "
+                    "WHERE attrelid = to_regclass('tasks') AND attname = 'result_urls' AND NOT attisdropped"
+                ))
+                if result.scalar():
+                    try:
+                        async with conn.begin_nested():
+                            # A plain ::jsonb cast fails the whole ALTER on one malformed row;
+                            # rows that are not valid JSON become NULL instead
+                            await conn.execute(text("""
+                                CREATE FUNCTION pg_temp.result_urls_to_jsonb(value TEXT) RETURNS JSONB AS $$
+                                BEGIN
+                                    RETURN NULLIF(btrim(value), '')::jsonb;
+                                EXCEPTION WHEN others THEN
+                                    RETURN NULL;
+                                END
+                                $$ LANGUAGE plpgsql IMMUTABLE
+                            """))
+                            await conn.execute(text(
+                                "ALTER TABLE tasks ALTER COLUMN result_urls TYPE JSONB "
+                                "USING pg_temp.result_urls_to_jsonb(result_urls)"
+                            ))
+                            await conn.execute(text("DROP FUNCTION pg_temp.result_urls_to_jsonb(TEXT)"))
+                        print("  ✓ Converted column 'result_urls' in tasks table to JSONB")
+                    except Exception as e:
+                        print(f"  ✗ Failed to convert column 'result_urls' to JSONB: {e}")
+                        ok = False
+
+            # Let token deletes cascade to projects and token_stats
+            for table_name in ("projects", "token_stats"):
+                if not await self._table_exists(conn, table_name):
+                    continue
+                result = await conn.execute(text(
+                    "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table_name) "
+                    "AND confrelid = to_regclass('tokens') AND contype = 'f' AND confdeltype <> 'c'"
+                ), {"table_name": table_name})
+                for constraint_name in result.scalars().all():
+                    try:
+                        async with conn.begin_nested():
+                            await conn.execute(text(
+                                f'ALTER TABLE {table_name} DROP CONSTRAINT "{constraint_name}", '
+                                f'ADD CONSTRAINT "{constraint_name}" FOREIGN KEY (token_id) REFERENCES tokens(id) ON DELETE CASCADE'
+                            ))
+                        print(f"  ✓ Set ON DELETE CASCADE on {table_name}.token_id")
+                    except Exception as e:
+                        print(f"  ✗ Failed to set ON DELETE CASCADE on {table_name}.token_id: {e}")
+                        ok = False
 
             # Ensure config rows
             await self._ensure_config_rows(conn, config_dict=None)
-            print("Database migration check completed.")
+
+        await self._create_indexes()
+        print("Database migration check completed.")
+        return ok
+
+    async def get_schema_version(self) -> int:
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_GET_SCHEMA_VERSION_SQL)
+            return result.scalar() or 0
+
+    async def set_schema_version(self, version: int):
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(_SET_SCHEMA_VERSION_SQL, {"version": version})
+
+    async def _create_indexes(self):
+        """Create hot-path indexes without blocking writers
+
+        CREATE INDEX CONCURRENTLY cannot run inside a transaction block,
+        so this uses the AUTOCOMMIT engine, one statement at a time.
+        """
+        async with self._autocommit_engine.connect() as conn:
+            for statement in _CONCURRENT_INDEXES:
+                try:
+                    await conn.execute(text(statement))
+                except Exception as e:
+                    print(f"  ✗ Failed to create index ({statement}): {e}")
 
     async def init_config_from_toml(self, config_dict: dict, is_first_startup: bool = True):
         async with self.engine.begin() as conn:
@@ -365,28 +800,26 @@ class PostgresAdapter(DatabaseAdapter):
                 await self._ensure_config_rows(conn, config_dict)
             else:
                 await self._ensure_config_rows(conn, config_dict=None)
+        self._config_cache.clear()
 
     async def reload_config_to_memory(self):
         from ..config import config
 
-        admin_config = await self.get_admin_config()
+        admin_config, _, generation_config, cache_config, debug_config = await self.get_all_config()
         if admin_config:
             config.set_admin_username_from_db(admin_config.username)
             config.set_admin_password_from_db(admin_config.password)
-            config.api_key = admin_config.api_key
+            config.set_api_key_from_db(admin_config.api_key)
 
-        cache_config = await self.get_cache_config()
         if cache_config:
             config.set_cache_enabled(cache_config.cache_enabled)
             config.set_cache_timeout(cache_config.cache_timeout)
             config.set_cache_base_url(cache_config.cache_base_url or "")
 
-        generation_config = await self.get_generation_config()
         if generation_config:
             config.set_image_timeout(generation_config.image_timeout)
             config.set_video_timeout(generation_config.video_timeout)
 
-        debug_config = await self.get_debug_config()
         if debug_config:
             config.set_debug_enabled(debug_config.enabled)
 
@@ -398,170 +831,140 @@ class PostgresAdapter(DatabaseAdapter):
     # Token operations
     async def add_token(self, token: Token) -> int:
         """Add a new token"""
-        async with self.async_session() as session:
-            async with session.begin():
-                # Using model_dump to get dictionary, but need to ensure keys match
-                params = token.model_dump()
-                result = await session.execute(text("""
-                    INSERT INTO tokens (st, at, at_expires, email, name, remark, is_active,
-                                       credits, user_paygate_tier, current_project_id, current_project_name,
-                                       image_enabled, video_enabled, image_concurrency, video_concurrency)
-                    VALUES (:st, :at, :at_expires, :email, :name, :remark, :is_active,
-                            :credits, :user_paygate_tier, :current_project_id, :current_project_name,
-                            :image_enabled, :video_enabled, :image_concurrency, :video_concurrency)
-                    RETURNING id
-                """), params)
-                token_id = result.scalar()
-
-                await session.execute(text("""
-                    INSERT INTO token_stats (token_id) VALUES (:token_id)
-                """), {"token_id": token_id})
-                
-                return token_id
+        async with self._autocommit_engine.connect() as conn:
+            # Using model_dump to get dictionary, but need to ensure keys match
+            params = token.model_dump()
+            # Token and its stats row are created in one statement
+            result = await conn.execute(_ADD_TOKEN_SQL, params)
+            return result.scalar()
 
     async def get_token(self, token_id: int) -> Optional[Token]:
         """Get token by ID"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM tokens WHERE id = :id"), {"id": token_id})
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_GET_TOKEN_SQL, {"id": token_id})
             row = result.mappings().fetchone()
             if row:
-                return Token(**dict(row))
+                return Token.model_construct(**row)
             return None
 
     async def get_token_by_st(self, st: str) -> Optional[Token]:
         """Get token by ST"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM tokens WHERE st = :st"), {"st": st})
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_GET_TOKEN_BY_ST_SQL, {"st": st})
             row = result.mappings().fetchone()
             if row:
-                return Token(**dict(row))
+                return Token.model_construct(**row)
             return None
 
     async def get_all_tokens(self) -> List[Token]:
         """Get all tokens"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM tokens ORDER BY created_at DESC"))
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_ALL_TOKENS_SQL)
             rows = result.mappings().fetchall()
-            return [Token(**dict(row)) for row in rows]
+            return [Token.model_construct(**row) for row in rows]
+
+    async def iter_all_tokens(self) -> AsyncIterator[Token]:
+        """Stream all tokens through a server-side cursor"""
+        # asyncpg cursors need a transaction, so this runs on the transactional engine
+        async with self.engine.connect() as conn:
+            result = await conn.stream(
+                _ALL_TOKENS_SQL,
+                execution_options={"yield_per": _STREAM_CHUNK},
+            )
+            async for row in result.mappings():
+                yield Token.model_construct(**row)
 
     async def get_active_tokens(self) -> List[Token]:
         """Get all active tokens"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM tokens WHERE is_active = TRUE ORDER BY last_used_at ASC"))
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_ACTIVE_TOKENS_SQL)
             rows = result.mappings().fetchall()
-            return [Token(**dict(row)) for row in rows]
+            return [Token.model_construct(**row) for row in rows]
 
     async def update_token(self, token_id: int, **kwargs):
         """Update token fields"""
-        async with self.async_session() as session:
-            async with session.begin():
-                updates = []
-                params = {"token_id": token_id}
-
-                for key, value in kwargs.items():
-                    if value is not None:
-                        updates.append(f"{key} = :{key}")
-                        params[key] = value
+        params = update_fields(kwargs, TOKEN_UPDATE_COLUMNS)
+        if not params:
+            return
 
-                if updates:
-                    query = f"UPDATE tokens SET {', '.join(updates)} WHERE id = :token_id"
-                    await session.execute(text(query), params)
+        query = _update_sql("tokens", tuple(params), "id = :token_id")
+        params["token_id"] = token_id
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(query, params)
 
     async def delete_token(self, token_id: int):
         """Delete token and related data"""
-        async with self.async_session() as session:
-            async with session.begin():
-                await session.execute(text("DELETE FROM token_stats WHERE token_id = :id"), {"id": token_id})
-                await session.execute(text("DELETE FROM projects WHERE token_id = :id"), {"id": token_id})
-                await session.execute(text("DELETE FROM tokens WHERE id = :id"), {"id": token_id})
+        async with self._autocommit_engine.connect() as conn:
+            # token_stats and projects rows go with it via ON DELETE CASCADE
+            await conn.execute(_DELETE_TOKEN_SQL, {"id": token_id})
 
     # Project operations
     async def add_project(self, project: Project) -> int:
         """Add a new project"""
-        async with self.async_session() as session:
-            async with session.begin():
-                params = project.model_dump()
-                result = await session.execute(text("""
-                    INSERT INTO projects (project_id, token_id, project_name, tool_name, is_active)
-                    VALUES (:project_id, :token_id, :project_name, :tool_name, :is_active)
-                    RETURNING id
-                """), params)
-                return result.scalar()
+        async with self._autocommit_engine.connect() as conn:
+            params = project.model_dump()
+            result = await conn.execute(_ADD_PROJECT_SQL, params)
+            return result.scalar()
 
     async def get_project_by_id(self, project_id: str) -> Optional[Project]:
         """Get project by UUID"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM projects WHERE project_id = :pid"), {"pid": project_id})
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_GET_PROJECT_SQL, {"pid": project_id})
             row = result.mappings().fetchone()
             if row:
-                return Project(**dict(row))
+                return Project.model_construct(**row)
             return None
 
     async def get_projects_by_token(self, token_id: int) -> List[Project]:
         """Get all projects for a token"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text(
-                "SELECT * FROM projects WHERE token_id = :tid ORDER BY created_at DESC"
-            ), {"tid": token_id})
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_PROJECTS_BY_TOKEN_SQL, {"tid": token_id})
             rows = result.mappings().fetchall()
-            return [Project(**dict(row)) for row in rows]
+            return [Project.model_construct(**row) for row in rows]
 
     async def delete_project(self, project_id: str):
         """Delete project"""
-        async with self.async_session() as session:
-            async with session.begin():
-                await session.execute(text("DELETE FROM projects WHERE project_id = :pid"), {"pid": project_id})
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(_DELETE_PROJECT_SQL, {"pid": project_id})
 
     # Task operations
     async def create_task(self, task: Task) -> int:
         """Create a new task"""
-        async with self.async_session() as session:
-            async with session.begin():
-                params = task.model_dump()
-                # result_urls is usually None at creation or handled by Task model dump
-                if isinstance(params.get("result_urls"), list):
-                    params["result_urls"] = json.dumps(params["result_urls"])
-                
-                result = await session.execute(text("""
-                    INSERT INTO tasks (task_id, token_id, model, prompt, status, progress, scene_id, result_urls, error_message)
-                    VALUES (:task_id, :token_id, :model, :prompt, :status, :progress, :scene_id, :result_urls, :error_message)
-                    RETURNING id
-                """), params)
-                return result.scalar()
+        async with self._autocommit_engine.connect() as conn:
+            params = task.model_dump()
+            # result_urls is usually None at creation or handled by Task model dump
+            if isinstance(params.get("result_urls"), list):
+                params["result_urls"] = dump_json(params["result_urls"])
+
+            result = await conn.execute(_CREATE_TASK_SQL, params)
+            return result.scalar()
 
     async def get_task(self, task_id: str) -> Optional[Task]:
         """Get task by ID"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM tasks WHERE task_id = :tid"), {"tid": task_id})
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_GET_TASK_SQL, {"tid": task_id})
             row = result.mappings().fetchone()
             if row:
-                task_dict = dict(row)
-                if task_dict.get("result_urls"):
-                    try:
-                        task_dict["result_urls"] = json.loads(task_dict["result_urls"])
-                    except:
-                        pass # Keep as string if not valid JSON
-                return Task(**task_dict)
+                row = dict(row)
+                # Decoded by the jsonb codec once the column is JSONB; still a string on
+                # databases whose TEXT -> JSONB migration has not completed yet
+                if isinstance(row["result_urls"], str):
+                    row["result_urls"] = load_json(row["result_urls"]) if row["result_urls"].strip() else None
+                return Task.model_construct(**row)
             return None
 
     async def update_task(self, task_id: str, **kwargs):
         """Update task"""
-        async with self.async_session() as session:
-            async with session.begin():
-                updates = []
-                params = {"task_id": task_id}
+        params = update_fields(kwargs, TASK_UPDATE_COLUMNS)
+        if not params:
+            return
+        if isinstance(params.get("result_urls"), list):
+            params["result_urls"] = dump_json(params["result_urls"])
 
-                for key, value in kwargs.items():
-                    if value is not None:
-                        if key == "result_urls" and isinstance(value, list):
-                            value = json.dumps(value)
-                        
-                        updates.append(f"{key} = :{key}")
-                        params[key] = value
-
-                if updates:
-                    query = f"UPDATE tasks SET {', '.join(updates)} WHERE task_id = :task_id"
-                    await session.execute(text(query), params)
+        query = _update_sql("tasks", tuple(params), "task_id = :task_id")
+        params["task_id"] = task_id
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(query, params)
 
     # Token stats operations
     async def increment_token_stats(self, token_id: int, stat_type: str):
@@ -575,315 +978,186 @@ class PostgresAdapter(DatabaseAdapter):
 
     async def get_token_stats(self, token_id: int) -> Optional[TokenStats]:
         """Get token statistics"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM token_stats WHERE token_id = :tid"), {"tid": token_id})
+        # Buffered image/video increments would otherwise be missing from the counts
+        await self._stats_buffer.flush()
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_GET_TOKEN_STATS_SQL, {"tid": token_id})
             row = result.mappings().fetchone()
             if row:
                 return TokenStats(**dict(row))
             return None
     
-    async def increment_image_count(self, token_id: int):
-        """Increment image generation count with daily reset"""
-        today = date.today()
+    async def _flush_stats(self, batch: List[Tuple[int, str]]):
+        """Apply coalesced image/video increments, one UPDATE per (token, stat)"""
+        statements = {"image": _INCREMENT_IMAGE_SQL, "video": _INCREMENT_VIDEO_SQL}
         async with self.async_session() as session:
             async with session.begin():
-                result = await session.execute(text(
-                    "SELECT today_date FROM token_stats WHERE token_id = :tid FOR UPDATE"
-                ), {"tid": token_id})
-                row = result.fetchone()
-
-                if row and row[0] != today:
-                    await session.execute(text("""
-                        UPDATE token_stats
-                        SET image_count = image_count + 1,
-                            today_image_count = 1,
-                            today_date = :today
-                        WHERE token_id = :tid
-                    """), {"today": today, "tid": token_id})
-                else:
-                    await session.execute(text("""
-                        UPDATE token_stats
-                        SET image_count = image_count + 1,
-                            today_image_count = today_image_count + 1,
-                            today_date = :today
-                        WHERE token_id = :tid
-                    """), {"today": today, "tid": token_id})
+                for (token_id, stat_type), n in Counter(batch).items():
+                    await session.execute(statements[stat_type], {"n": n, "tid": token_id})
+
+    async def increment_image_count(self, token_id: int):
+        """Increment image generation count with daily reset (buffered, off the request path)"""
+        await self._stats_buffer.put((token_id, "image"))
 
     async def increment_video_count(self, token_id: int):
-        """Increment video generation count with daily reset"""
-        today = date.today()
-        async with self.async_session() as session:
-            async with session.begin():
-                result = await session.execute(text(
-                    "SELECT today_date FROM token_stats WHERE token_id = :tid FOR UPDATE"
-                ), {"tid": token_id})
-                row = result.fetchone()
-
-                if row and row[0] != today:
-                    await session.execute(text("""
-                        UPDATE token_stats
-                        SET video_count = video_count + 1,
-                            today_video_count = 1,
-                            today_date = :today
-                        WHERE token_id = :tid
-                    """), {"today": today, "tid": token_id})
-                else:
-                    await session.execute(text("""
-                        UPDATE token_stats
-                        SET video_count = video_count + 1,
-                            today_video_count = today_video_count + 1,
-                            today_date = :today
-                        WHERE token_id = :tid
-                    """), {"today": today, "tid": token_id})
+        """Increment video generation count with daily reset (buffered, off the request path)"""
+        await self._stats_buffer.put((token_id, "video"))
 
     async def increment_error_count(self, token_id: int):
         """Increment error count with daily reset"""
-        today = date.today()
-        async with self.async_session() as session:
-            async with session.begin():
-                result = await session.execute(text(
-                    "SELECT today_date FROM token_stats WHERE token_id = :tid FOR UPDATE"
-                ), {"tid": token_id})
-                row = result.fetchone()
-
-                if row and row[0] != today:
-                    await session.execute(text("""
-                        UPDATE token_stats
-                        SET error_count = error_count + 1,
-                            consecutive_error_count = consecutive_error_count + 1,
-                            today_error_count = 1,
-                            today_date = :today,
-                            last_error_at = CURRENT_TIMESTAMP
-                        WHERE token_id = :tid
-                    """), {"today": today, "tid": token_id})
-                else:
-                    await session.execute(text("""
-                        UPDATE token_stats
-                        SET error_count = error_count + 1,
-                            consecutive_error_count = consecutive_error_count + 1,
-                            today_error_count = today_error_count + 1,
-                            today_date = :today,
-                            last_error_at = CURRENT_TIMESTAMP
-                        WHERE token_id = :tid
-                    """), {"today": today, "tid": token_id})
+        # Written synchronously: record_error reads consecutive_error_count right after for auto-ban
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(_INCREMENT_ERROR_SQL, {"tid": token_id})
 
     async def reset_error_count(self, token_id: int):
         """Reset consecutive error count"""
-        async with self.async_session() as session:
-            async with session.begin():
-                await session.execute(text(
-                    "UPDATE token_stats SET consecutive_error_count = 0 WHERE token_id = :tid"
-                ), {"tid": token_id})
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(_RESET_ERROR_SQL, {"tid": token_id})
 
     # Config operations
+    def _cache_config_row(self, table: str, model, row: Optional[Mapping], now: float):
+        default = _CONFIG_ROW_DEFAULTS.get(table)
+        value = model(**dict(row)) if row else (default() if default else None)
+        self._config_cache[table] = (now + _CONFIG_CACHE_TTL, value)
+        return value
+
+    async def _get_config_row(self, table: str, statement: TextClause, model):
+        """Read a single-row config table through a short in-process TTL cache"""
+        now = time.monotonic()
+        cached = self._config_cache.get(table)
+        if cached and cached[0] > now:
+            return cached[1]
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(statement)
+            row = result.mappings().fetchone()
+        return self._cache_config_row(table, model, row, now)
+
+    async def get_all_config(self) -> Tuple[Optional[AdminConfig], Optional[ProxyConfig], Optional[GenerationConfig],
+                                            CacheConfig, Optional[DebugConfig]]:
+        """Get admin, proxy, generation, cache and debug config in one round-trip (refreshes the cache)"""
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_GET_ALL_CONFIG_SQL)
+            row = result.mappings().fetchone()
+        now = time.monotonic()
+        return tuple(
+            self._cache_config_row(table, model, row[table], now)
+            for table, model in _CONFIG_ROW_MODELS
+        )
+
     async def get_admin_config(self) -> Optional[AdminConfig]:
         """Get admin configuration"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM admin_config WHERE id = 1"))
-            row = result.mappings().fetchone()
-            if row:
-                return AdminConfig(**dict(row))
-            return None
+        return await self._get_config_row("admin_config", _GET_ADMIN_CONFIG_SQL, AdminConfig)
 
     async def update_admin_config(self, **kwargs):
         """Update admin configuration"""
-        async with self.async_session() as session:
-            async with session.begin():
-                updates = []
-                params = {"id": 1}
-
-                for key, value in kwargs.items():
-                    if value is not None:
-                        updates.append(f"{key} = :{key}")
-                        params[key] = value
+        params = update_fields(kwargs, ADMIN_CONFIG_UPDATE_COLUMNS)
+        if not params:
+            return
 
-                if updates:
-                    updates.append("updated_at = CURRENT_TIMESTAMP")
-                    query = f"UPDATE admin_config SET {', '.join(updates)} WHERE id = :id"
-                    await session.execute(text(query), params)
+        query = _update_sql("admin_config", tuple(params), "id = 1", touch_updated_at=True)
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(query, params)
+        self._config_cache.pop("admin_config", None)
 
     async def get_proxy_config(self) -> Optional[ProxyConfig]:
         """Get proxy configuration"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM proxy_config WHERE id = 1"))
-            row = result.mappings().fetchone()
-            if row:
-                return ProxyConfig(**dict(row))
-            return None
+        return await self._get_config_row("proxy_config", _GET_PROXY_CONFIG_SQL, ProxyConfig)
 
     async def update_proxy_config(self, enabled: bool, proxy_url: Optional[str] = None):
         """Update proxy configuration"""
-        async with self.async_session() as session:
-            async with session.begin():
-                await session.execute(text("""
-                    UPDATE proxy_config
-                    SET enabled = :enabled, proxy_url = :url, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = 1
-                """), {"enabled": enabled, "url": proxy_url})
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(_UPDATE_PROXY_CONFIG_SQL, {"enabled": enabled, "url": proxy_url})
+        self._config_cache.pop("proxy_config", None)
 
     async def get_generation_config(self) -> Optional[GenerationConfig]:
         """Get generation configuration"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM generation_config WHERE id = 1"))
-            row = result.mappings().fetchone()
-            if row:
-                return GenerationConfig(**dict(row))
-            return None
+        return await self._get_config_row("generation_config", _GET_GENERATION_CONFIG_SQL, GenerationConfig)
 
     async def update_generation_config(self, image_timeout: int, video_timeout: int):
         """Update generation configuration"""
-        async with self.async_session() as session:
-            async with session.begin():
-                await session.execute(text("""
-                    UPDATE generation_config
-                    SET image_timeout = :it, video_timeout = :vt, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = 1
-                """), {"it": image_timeout, "vt": video_timeout})
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(_UPDATE_GENERATION_CONFIG_SQL, {"it": image_timeout, "vt": video_timeout})
+        self._config_cache.pop("generation_config", None)
 
     async def get_cache_config(self) -> CacheConfig:
         """Get cache configuration"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM cache_config WHERE id = 1"))
-            row = result.mappings().fetchone()
-            if row:
-                return CacheConfig(**dict(row))
-            return CacheConfig(cache_enabled=False, cache_timeout=7200)
+        return await self._get_config_row("cache_config", _GET_CACHE_CONFIG_SQL, CacheConfig)
 
     async def update_cache_config(self, enabled: bool = None, timeout: int = None, base_url: Optional[str] = None):
         """Update cache configuration"""
-        async with self.async_session() as session:
-            async with session.begin():
-                # Select for update to handle read-modify-write if row exists
-                # But here we just want to update fields if provided.
-                
-                # We can't easily do partial update without reading first unless we build dynamic query.
-                # Or we can do `COALESCE(:val, column)` trick if we pass NULL for unset values.
-                # But implementation in SQLite was: read existing, merge, update.
-                
-                result = await session.execute(text("SELECT * FROM cache_config WHERE id = 1 FOR UPDATE"))
-                row = result.mappings().fetchone()
-                
-                if row:
-                    current = dict(row)
-                    new_enabled = enabled if enabled is not None else current.get("cache_enabled", False)
-                    new_timeout = timeout if timeout is not None else current.get("cache_timeout", 7200)
-                    new_base_url = base_url if base_url is not None else current.get("cache_base_url")
-                    
-                    if base_url == "":
-                        new_base_url = None
-                    
-                    await session.execute(text("""
-                        UPDATE cache_config
-                        SET cache_enabled = :e, cache_timeout = :t, cache_base_url = :u, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = 1
-                    """), {"e": new_enabled, "t": new_timeout, "u": new_base_url})
-                else:
-                    new_enabled = enabled if enabled is not None else False
-                    new_timeout = timeout if timeout is not None else 7200
-                    new_base_url = base_url if base_url is not None else None
-                    
-                    await session.execute(text("""
-                        INSERT INTO cache_config (id, cache_enabled, cache_timeout, cache_base_url)
-                        VALUES (1, :e, :t, :u)
-                    """), {"e": new_enabled, "t": new_timeout, "u": new_base_url})
+        # One upsert: NULL parameters keep the stored value, so no SELECT ... FOR UPDATE first.
+        # base_url=None keeps the column, "" clears it
+        if enabled is None and timeout is None and base_url is None:
+            return
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(_UPSERT_CACHE_CONFIG_SQL, {
+                "e": enabled, "t": timeout, "u": base_url or None, "u_set": base_url is not None,
+            })
+        self._config_cache.pop("cache_config", None)
 
     async def get_debug_config(self) -> Optional[DebugConfig]:
         """Get debug configuration"""
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text("SELECT * FROM debug_config WHERE id = 1"))
-            row = result.mappings().fetchone()
-            if row:
-                return DebugConfig(**dict(row))
-            return DebugConfig(enabled=False, log_requests=True, log_responses=True, mask_token=True)
+        return await self._get_config_row("debug_config", _GET_DEBUG_CONFIG_SQL, DebugConfig)
 
     async def update_debug_config(self, **kwargs):
         """Update debug configuration"""
-        async with self.async_session() as session:
-            async with session.begin():
-                result = await session.execute(text("SELECT * FROM debug_config WHERE id = 1 FOR UPDATE"))
-                row = result.mappings().fetchone()
-
-                if row:
-                    current = dict(row)
-                    new_enabled = kwargs.get("enabled") if kwargs.get("enabled") is not None else current.get("enabled", False)
-                    new_log_requests = kwargs.get("log_requests") if kwargs.get("log_requests") is not None else current.get("log_requests", True)
-                    new_log_responses = kwargs.get("log_responses") if kwargs.get("log_responses") is not None else current.get("log_responses", True)
-                    new_mask_token = kwargs.get("mask_token") if kwargs.get("mask_token") is not None else current.get("mask_token", True)
-                    
-                    await session.execute(text("""
-                        UPDATE debug_config
-                        SET enabled = :e, log_requests = :lr, log_responses = :lrs, mask_token = :m, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = 1
-                    """), {"e": new_enabled, "lr": new_log_requests, "lrs": new_log_responses, "m": new_mask_token})
-                else:
-                     # Insert default if missing
-                    new_enabled = kwargs.get("enabled", False)
-                    new_log_requests = kwargs.get("log_requests", True)
-                    new_log_responses = kwargs.get("log_responses", True)
-                    new_mask_token = kwargs.get("mask_token", True)
-
-                    await session.execute(text("""
-                        INSERT INTO debug_config (id, enabled, log_requests, log_responses, mask_token)
-                        VALUES (1, :e, :lr, :lrs, :m)
-                    """), {"e": new_enabled, "lr": new_log_requests, "lrs": new_log_responses, "m": new_mask_token})
+        if all(kwargs.get(key) is None for key in ("enabled", "log_requests", "log_responses", "mask_token")):
+            return
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(_UPSERT_DEBUG_CONFIG_SQL, {
+                "e": kwargs.get("enabled"), "lr": kwargs.get("log_requests"),
+                "lrs": kwargs.get("log_responses"), "m": kwargs.get("mask_token"),
+            })
+        self._config_cache.pop("debug_config", None)
 
     # Request log operations
     async def add_request_log(self, log: RequestLog):
-        """Add request log"""
+        """Add request log (buffered, written in batches off the request path)"""
+        await self._log_buffer.put(log)
+
+    async def _flush_logs(self, batch: List[RequestLog]):
+        """Insert a batch of request logs in one transaction"""
+        if len(batch) >= _COPY_MIN_ROWS:
+            # Large bursts: COPY streams binary rows and skips the SQL parser entirely
+            records = [tuple(getattr(log, column) for column in _REQUEST_LOG_COLUMNS) for log in batch]
+            async with self.engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.copy_records_to_table(
+                    "request_logs", records=records, columns=_REQUEST_LOG_COLUMNS
+                )
+            return
+
         async with self.async_session() as session:
             async with session.begin():
-                await session.execute(text("""
-                    INSERT INTO request_logs (token_id, operation, request_body, response_body, status_code, duration)
-                    VALUES (:token_id, :operation, :request_body, :response_body, :status_code, :duration)
-                """), {
-                    "token_id": log.token_id,
-                    "operation": log.operation,
-                    "request_body": log.request_body,
-                    "response_body": log.response_body,
-                    "status_code": log.status_code,
-                    "duration": log.duration
-                })
-
-    async def get_logs(self, limit: int = 100, token_id: Optional[int] = None):
-        """Get request logs"""
-        async with self.engine.connect() as conn:
-            if token_id:
-                result = await conn.execute(text("""
-                    SELECT
-                        rl.id,
-                        rl.token_id,
-                        rl.operation,
-                        rl.request_body,
-                        rl.response_body,
-                        rl.status_code,
-                        rl.duration,
-                        rl.created_at,
-                        t.email as token_email,
-                        t.name as token_username
-                    FROM request_logs rl
-                    LEFT JOIN tokens t ON rl.token_id = t.id
-                    WHERE rl.token_id = :tid
-                    ORDER BY rl.created_at DESC
-                    LIMIT :limit
-                """), {"tid": token_id, "limit": limit})
-            else:
-                result = await conn.execute(text("""
-                    SELECT
-                        rl.id,
-                        rl.token_id,
-                        rl.operation,
-                        rl.request_body,
-                        rl.response_body,
-                        rl.status_code,
-                        rl.duration,
-                        rl.created_at,
-                        t.email as token_email,
-                        t.name as token_username
-                    FROM request_logs rl
-                    LEFT JOIN tokens t ON rl.token_id = t.id
-                    ORDER BY rl.created_at DESC
-                    LIMIT :limit
-                """), {"limit": limit})
-            
-            rows = result.mappings().fetchall()
-            return [dict(row) for row in rows]
+                await session.execute(_ADD_REQUEST_LOG_SQL, [_request_log_params(log) for log in batch])
+
+    async def _insert_log(self, log: RequestLog):
+        """Insert a single request log (retry path for a batch that failed)"""
+        async with self._autocommit_engine.connect() as conn:
+            await conn.execute(_ADD_REQUEST_LOG_SQL, _request_log_params(log))
+
+    async def get_logs(self, limit: int = 100, token_id: Optional[int] = None,
+                       before: Optional[Tuple[datetime, int]] = None, include_bodies: bool = False):
+        """Get request logs, newest first; pass the last row's (created_at, id) as before for the next page"""
+        params = {"limit": limit}
+        if token_id:
+            params["tid"] = token_id
+        if before:
+            params["bts"], params["bid"] = before
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_logs_sql(bool(token_id), bool(before), include_bodies), params)
+            # RowMapping is already a read-only Mapping (.get, [], keys); no per-row dict copy
+            return result.mappings().all()
+
+    async def get_log_detail(self, log_id: int) -> Optional[dict]:
+        """Get a single request log including its request/response bodies"""
+        async with self._autocommit_engine.connect() as conn:
+            result = await conn.execute(_GET_LOG_DETAIL_SQL, {"id": log_id})
+            row = result.mappings().fetchone()
+            return dict(row) if row else None
+
+    async def close(self):
+        """Flush buffered writes and dispose of the connection pool"""
+        await self._stats_buffer.close()
+        await self._log_buffer.close()
+        await self.engine.dispose()
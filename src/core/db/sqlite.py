@@ -1,11 +1,29 @@
 """Database storage layer for Flow2API"""
 import aiosqlite
-import json
+from aiosqlitepool import SQLiteConnectionPool
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional, List
+from functools import lru_cache
+from typing import Optional, List, Tuple, AsyncIterator
 from pathlib import Path
 from ..models import Token, TokenStats, Task, RequestLog, AdminConfig, ProxyConfig, GenerationConfig, CacheConfig, Project
-from .base import DatabaseAdapter
+from .base import (
+    DatabaseAdapter, merge_config_defaults, update_fields, dump_json, load_json,
+    TOKEN_UPDATE_COLUMNS, TASK_UPDATE_COLUMNS, ADMIN_CONFIG_UPDATE_COLUMNS
+)
+
+
+@lru_cache(maxsize=128)
+def _update_sql(table: str, columns: Tuple[str, ...], where: str, touch_updated_at: bool = False) -> str:
+    """Build the UPDATE statement for one combination of columns (cached per combination)"""
+    updates = [f"{column} = ?" for column in columns]
+    if touch_updated_at:
+        updates.append("updated_at = CURRENT_TIMESTAMP")
+    return f"UPDATE {table} SET {', '.join(updates)} WHERE {where}"
+
+
+# Pooled connections per adapter
+_POOL_SIZE = 8
 
 
 class SqliteAdapter(DatabaseAdapter):
@@ -18,6 +36,27 @@ class SqliteAdapter(DatabaseAdapter):
             data_dir.mkdir(exist_ok=True)
             db_path = str(data_dir / "flow.db")
         self.db_path = db_path
+        # Connections are kept open and reused, so SQLite's page cache stays warm between queries
+        self._pool = SQLiteConnectionPool(self._open_connection, pool_size=_POOL_SIZE)
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        """Open a pooled connection; WAL lets readers proceed alongside the single writer"""
+        conn = await aiosqlite.connect(self.db_path)
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a pooled connection (uncommitted work is rolled back on release)"""
+        async with self._pool.connection() as conn:
+            # Callers opt into aiosqlite.Row per use; start each borrow with plain tuples
+            conn.row_factory = None
+            yield conn
+
+    async def close(self):
+        """Close pooled connections"""
+        await self._pool.close()
 
     async def is_initialized(self) -> bool:
         """Check if database file exists"""
@@ -53,106 +92,63 @@ class SqliteAdapter(DatabaseAdapter):
             config_dict: Configuration dictionary from setting.toml (optional)
                         If None, use default values instead of reading from TOML.
         """
+        defaults = merge_config_defaults(config_dict)
+
         # Ensure admin_config has a row
         cursor = await db.execute("SELECT COUNT(*) FROM admin_config")
         count = await cursor.fetchone()
         if count[0] == 0:
-            admin_username = "admin"
-            admin_password = "admin"
-            api_key = "han1234"
-            error_ban_threshold = 3
-
-            if config_dict:
-                global_config = config_dict.get("global", {})
-                admin_username = global_config.get("admin_username", "admin")
-                admin_password = global_config.get("admin_password", "admin")
-                api_key = global_config.get("api_key", "han1234")
-
-                admin_config = config_dict.get("admin", {})
-                error_ban_threshold = admin_config.get("error_ban_threshold", 3)
-
+            global_config = defaults["global"]
             await db.execute("""
                 INSERT INTO admin_config (id, username, password, api_key, error_ban_threshold)
                 VALUES (1, ?, ?, ?, ?)
-            """, (admin_username, admin_password, api_key, error_ban_threshold))
+            """, (global_config["admin_username"], global_config["admin_password"],
+                  global_config["api_key"], defaults["admin"]["error_ban_threshold"]))
 
         # Ensure proxy_config has a row
         cursor = await db.execute("SELECT COUNT(*) FROM proxy_config")
         count = await cursor.fetchone()
         if count[0] == 0:
-            proxy_enabled = False
-            proxy_url = None
-
-            if config_dict:
-                proxy_config = config_dict.get("proxy", {})
-                proxy_enabled = proxy_config.get("proxy_enabled", False)
-                proxy_url = proxy_config.get("proxy_url", "")
-                proxy_url = proxy_url if proxy_url else None
-
+            proxy_config = defaults["proxy"]
             await db.execute("""
                 INSERT INTO proxy_config (id, enabled, proxy_url)
                 VALUES (1, ?, ?)
-            """, (proxy_enabled, proxy_url))
+            """, (proxy_config["proxy_enabled"], proxy_config["proxy_url"] or None))
 
         # Ensure generation_config has a row
         cursor = await db.execute("SELECT COUNT(*) FROM generation_config")
         count = await cursor.fetchone()
         if count[0] == 0:
-            image_timeout = 300
-            video_timeout = 1500
-
-            if config_dict:
-                generation_config = config_dict.get("generation", {})
-                image_timeout = generation_config.get("image_timeout", 300)
-                video_timeout = generation_config.get("video_timeout", 1500)
-
+            generation_config = defaults["generation"]
             await db.execute("""
                 INSERT INTO generation_config (id, image_timeout, video_timeout)
                 VALUES (1, ?, ?)
-            """, (image_timeout, video_timeout))
+            """, (generation_config["image_timeout"], generation_config["video_timeout"]))
 
         # Ensure cache_config has a row
         cursor = await db.execute("SELECT COUNT(*) FROM cache_config")
         count = await cursor.fetchone()
         if count[0] == 0:
-            cache_enabled = False
-            cache_timeout = 7200
-            cache_base_url = None
-
-            if config_dict:
-                cache_config = config_dict.get("cache", {})
-                cache_enabled = cache_config.get("enabled", False)
-                cache_timeout = cache_config.get("timeout", 7200)
-                cache_base_url = cache_config.get("base_url", "")
-                # Convert empty string to None
-                cache_base_url = cache_base_url if cache_base_url else None
-
+            cache_config = defaults["cache"]
+            # Convert empty base_url to None
             await db.execute("""
                 INSERT INTO cache_config (id, cache_enabled, cache_timeout, cache_base_url)
                 VALUES (1, ?, ?, ?)
-            """, (cache_enabled, cache_timeout, cache_base_url))
+            """, (cache_config["enabled"], cache_config["timeout"], cache_config["base_url"] or None))
 
         # Ensure debug_config has a row
         cursor = await db.execute("SELECT COUNT(*) FROM debug_config")
         count = await cursor.fetchone()
         if count[0] == 0:
-            debug_enabled = False
-            log_requests = True
-            log_responses = True
-            mask_token = True
-
-            if config_dict:
-                debug_config = config_dict.get("debug", {})
-                debug_enabled = debug_config.get("enabled", False)
-                log_requests = debug_config.get("log_requests", True)
-                log_responses = debug_config.get("log_responses", True)
-                mask_token = debug_config.get("mask_token", True)
-
+            debug_config = defaults["debug"]
             await db.execute("""
                 INSERT INTO debug_config (id, enabled, log_requests, log_responses, mask_token)
                 VALUES (1, ?, ?, ?, ?)
-            """, (debug_enabled, log_requests, log_responses, mask_token))
+            """, (debug_config["enabled"], debug_config["log_requests"],
+                  debug_config["log_responses"], debug_config["mask_token"]))
 
+    # Adding a migration below? Bump SCHEMA_VERSION in base.py, or databases already
+    # stamped with the current version will never run it
     async def check_and_migrate_db(self, config_dict: dict = None):
         """Check database integrity and perform migrations if needed
 
@@ -165,8 +161,12 @@ class SqliteAdapter(DatabaseAdapter):
             config_dict: Configuration dictionary from setting.toml (optional)
                         Used only to initialize missing config rows with default values.
                         Existing config rows will NOT be overwritten.
+
+        Returns:
+            False if any migration step failed, True otherwise
         """
-        async with aiosqlite.connect(self.db_path) as db:
+        ok = True
+        async with self._connection() as db:
             print("Checking database integrity and performing migrations...")
 
             # ========== Step 1: Create missing tables ==========
@@ -207,6 +207,7 @@ class SqliteAdapter(DatabaseAdapter):
                             print(f"  ✓ Added column '{col_name}' to tokens table")
                         except Exception as e:
                             print(f"  ✗ Failed to add column '{col_name}': {e}")
+                            ok = False
 
             # Check and add missing columns to admin_config table
             if await self._table_exists(db, "admin_config"):
@@ -216,6 +217,7 @@ class SqliteAdapter(DatabaseAdapter):
                         print("  ✓ Added column 'error_ban_threshold' to admin_config table")
                     except Exception as e:
                         print(f"  ✗ Failed to add column 'error_ban_threshold': {e}")
+                        ok = False
 
             # Check and add missing columns to token_stats table
             if await self._table_exists(db, "token_stats"):
@@ -234,6 +236,7 @@ class SqliteAdapter(DatabaseAdapter):
                             print(f"  ✓ Added column '{col_name}' to token_stats table")
                         except Exception as e:
                             print(f"  ✗ Failed to add column '{col_name}': {e}")
+                            ok = False
 
             # ========== Step 3: Ensure all config tables have default rows ==========
             # Note: This will NOT overwrite existing config rows
@@ -242,10 +245,24 @@ class SqliteAdapter(DatabaseAdapter):
 
             await db.commit()
             print("Database migration check completed.")
+        return ok
+
+    async def get_schema_version(self) -> int:
+        """Read the version from SQLite's user_version header field"""
+        async with self._connection() as db:
+            cursor = await db.execute("PRAGMA user_version")
+            row = await cursor.fetchone()
+            return row[0] if row else 0
+
+    async def set_schema_version(self, version: int):
+        async with self._connection() as db:
+            # PRAGMA takes no bound parameters; int() keeps the literal safe
+            await db.execute(f"PRAGMA user_version = {int(version)}")
+            await db.commit()
 
     async def init_db(self):
         """Initialize database tables"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             # Tokens table (Flow2API版本)
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS tokens (
@@ -404,6 +421,10 @@ class SqliteAdapter(DatabaseAdapter):
             # Migrate request_logs table if needed
             await self._migrate_request_logs(db)
 
+            # Keyset indexes for get_logs; created after the migration, which may rebuild the table
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_request_logs_created ON request_logs(created_at DESC, id DESC)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_request_logs_token_created ON request_logs(token_id, created_at DESC, id DESC)")
+
             await db.commit()
 
     async def _migrate_request_logs(self, db):
@@ -463,7 +484,7 @@ class SqliteAdapter(DatabaseAdapter):
     # Token operations
     async def add_token(self, token: Token) -> int:
         """Add a new token"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             cursor = await db.execute("""
                 INSERT INTO tokens (st, at, at_expires, email, name, remark, is_active,
                                    credits, user_paygate_tier, current_project_id, current_project_name,
@@ -487,7 +508,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def get_token(self, token_id: int) -> Optional[Token]:
         """Get token by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM tokens WHERE id = ?", (token_id,))
             row = await cursor.fetchone()
@@ -497,7 +518,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def get_token_by_st(self, st: str) -> Optional[Token]:
         """Get token by ST"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM tokens WHERE st = ?", (st,))
             row = await cursor.fetchone()
@@ -507,7 +528,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def get_all_tokens(self) -> List[Token]:
         """Get all tokens"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM tokens ORDER BY created_at DESC")
             rows = await cursor.fetchall()
@@ -515,7 +536,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def get_active_tokens(self) -> List[Token]:
         """Get all active tokens"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM tokens WHERE is_active = 1 ORDER BY last_used_at ASC")
             rows = await cursor.fetchall()
@@ -523,24 +544,18 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def update_token(self, token_id: int, **kwargs):
         """Update token fields"""
-        async with aiosqlite.connect(self.db_path) as db:
-            updates = []
-            params = []
-
-            for key, value in kwargs.items():
-                if value is not None:
-                    updates.append(f"{key} = ?")
-                    params.append(value)
+        fields = update_fields(kwargs, TOKEN_UPDATE_COLUMNS)
+        if not fields:
+            return
 
-            if updates:
-                params.append(token_id)
-                query = f"UPDATE tokens SET {', '.join(updates)} WHERE id = ?"
-                await db.execute(query, params)
-                await db.commit()
+        async with self._connection() as db:
+            query = _update_sql("tokens", tuple(fields), "id = ?")
+            await db.execute(query, (*fields.values(), token_id))
+            await db.commit()
 
     async def delete_token(self, token_id: int):
         """Delete token and related data"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute("DELETE FROM token_stats WHERE token_id = ?", (token_id,))
             await db.execute("DELETE FROM projects WHERE token_id = ?", (token_id,))
             await db.execute("DELETE FROM tokens WHERE id = ?", (token_id,))
@@ -549,7 +564,7 @@ class SqliteAdapter(DatabaseAdapter):
     # Project operations
     async def add_project(self, project: Project) -> int:
         """Add a new project"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             cursor = await db.execute("""
                 INSERT INTO projects (project_id, token_id, project_name, tool_name, is_active)
                 VALUES (?, ?, ?, ?, ?)
@@ -560,7 +575,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def get_project_by_id(self, project_id: str) -> Optional[Project]:
         """Get project by UUID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM projects WHERE project_id = ?", (project_id,))
             row = await cursor.fetchone()
@@ -570,7 +585,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def get_projects_by_token(self, token_id: int) -> List[Project]:
         """Get all projects for a token"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute(
                 "SELECT * FROM projects WHERE token_id = ? ORDER BY created_at DESC",
@@ -581,14 +596,14 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def delete_project(self, project_id: str):
         """Delete project"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
             await db.commit()
 
     # Task operations
     async def create_task(self, task: Task) -> int:
         """Create a new task"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             cursor = await db.execute("""
                 INSERT INTO tasks (task_id, token_id, model, prompt, status, progress, scene_id)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -599,7 +614,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def get_task(self, task_id: str) -> Optional[Task]:
         """Get task by ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,))
             row = await cursor.fetchone()
@@ -607,29 +622,23 @@ class SqliteAdapter(DatabaseAdapter):
                 task_dict = dict(row)
                 # Parse result_urls from JSON
                 if task_dict.get("result_urls"):
-                    task_dict["result_urls"] = json.loads(task_dict["result_urls"])
+                    task_dict["result_urls"] = load_json(task_dict["result_urls"])
                 return Task(**task_dict)
             return None
 
     async def update_task(self, task_id: str, **kwargs):
         """Update task"""
-        async with aiosqlite.connect(self.db_path) as db:
-            updates = []
-            params = []
-
-            for key, value in kwargs.items():
-                if value is not None:
-                    # Convert list to JSON string for result_urls
-                    if key == "result_urls" and isinstance(value, list):
-                        value = json.dumps(value)
-                    updates.append(f"{key} = ?")
-                    params.append(value)
-
-            if updates:
-                params.append(task_id)
-                query = f"UPDATE tasks SET {', '.join(updates)} WHERE task_id = ?"
-                await db.execute(query, params)
-                await db.commit()
+        fields = update_fields(kwargs, TASK_UPDATE_COLUMNS)
+        if not fields:
+            return
+        # Convert list to JSON string for result_urls
+        if isinstance(fields.get("result_urls"), list):
+            fields["result_urls"] = dump_json(fields["result_urls"])
+
+        async with self._connection() as db:
+            query = _update_sql("tasks", tuple(fields), "task_id = ?")
+            await db.execute(query, (*fields.values(), task_id))
+            await db.commit()
 
     # Token stats operations (kept for compatibility, now delegates to specific methods)
     async def increment_token_stats(self, token_id: int, stat_type: str):
@@ -643,7 +652,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def get_token_stats(self, token_id: int) -> Optional[TokenStats]:
         """Get token statistics"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM token_stats WHERE token_id = ?", (token_id,))
             row = await cursor.fetchone()
@@ -654,7 +663,7 @@ class SqliteAdapter(DatabaseAdapter):
     async def increment_image_count(self, token_id: int):
         """Increment image generation count with daily reset"""
         from datetime import date
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             today = str(date.today())
             # Get current stats
             cursor = await db.execute("SELECT today_date FROM token_stats WHERE token_id = ?", (token_id,))
@@ -683,7 +692,7 @@ class SqliteAdapter(DatabaseAdapter):
     async def increment_video_count(self, token_id: int):
         """Increment video generation count with daily reset"""
         from datetime import date
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             today = str(date.today())
             # Get current stats
             cursor = await db.execute("SELECT today_date FROM token_stats WHERE token_id = ?", (token_id,))
@@ -718,7 +727,7 @@ class SqliteAdapter(DatabaseAdapter):
         - today_error_count: Today's errors (reset on date change)
         """
         from datetime import date
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             today = str(date.today())
             # Get current stats
             cursor = await db.execute("SELECT today_date FROM token_stats WHERE token_id = ?", (token_id,))
@@ -757,7 +766,7 @@ class SqliteAdapter(DatabaseAdapter):
 
         Note: error_count (total historical errors) is NEVER reset
         """
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute("""
                 UPDATE token_stats SET consecutive_error_count = 0 WHERE token_id = ?
             """, (token_id,))
@@ -766,7 +775,7 @@ class SqliteAdapter(DatabaseAdapter):
     # Config operations
     async def get_admin_config(self) -> Optional[AdminConfig]:
         """Get admin configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM admin_config WHERE id = 1")
             row = await cursor.fetchone()
@@ -776,24 +785,18 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def update_admin_config(self, **kwargs):
         """Update admin configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
-            updates = []
-            params = []
+        fields = update_fields(kwargs, ADMIN_CONFIG_UPDATE_COLUMNS)
+        if not fields:
+            return
 
-            for key, value in kwargs.items():
-                if value is not None:
-                    updates.append(f"{key} = ?")
-                    params.append(value)
-
-            if updates:
-                updates.append("updated_at = CURRENT_TIMESTAMP")
-                query = f"UPDATE admin_config SET {', '.join(updates)} WHERE id = 1"
-                await db.execute(query, params)
-                await db.commit()
+        async with self._connection() as db:
+            query = _update_sql("admin_config", tuple(fields), "id = 1", touch_updated_at=True)
+            await db.execute(query, tuple(fields.values()))
+            await db.commit()
 
     async def get_proxy_config(self) -> Optional[ProxyConfig]:
         """Get proxy configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM proxy_config WHERE id = 1")
             row = await cursor.fetchone()
@@ -803,7 +806,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def update_proxy_config(self, enabled: bool, proxy_url: Optional[str] = None):
         """Update proxy configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute("""
                 UPDATE proxy_config
                 SET enabled = ?, proxy_url = ?, updated_at = CURRENT_TIMESTAMP
@@ -813,7 +816,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def get_generation_config(self) -> Optional[GenerationConfig]:
         """Get generation configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM generation_config WHERE id = 1")
             row = await cursor.fetchone()
@@ -823,7 +826,7 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def update_generation_config(self, image_timeout: int, video_timeout: int):
         """Update generation configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute("""
                 UPDATE generation_config
                 SET image_timeout = ?, video_timeout = ?, updated_at = CURRENT_TIMESTAMP
@@ -834,7 +837,7 @@ class SqliteAdapter(DatabaseAdapter):
     # Request log operations
     async def add_request_log(self, log: RequestLog):
         """Add request log"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             await db.execute("""
                 INSERT INTO request_logs (token_id, operation, request_body, response_body, status_code, duration)
                 VALUES (?, ?, ?, ?, ?, ?)
@@ -842,52 +845,68 @@ class SqliteAdapter(DatabaseAdapter):
                   log.status_code, log.duration))
             await db.commit()
 
-    async def get_logs(self, limit: int = 100, token_id: Optional[int] = None):
-        """Get request logs with token email"""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def get_logs(self, limit: int = 100, token_id: Optional[int] = None,
+                       before: Optional[Tuple[datetime, int]] = None, include_bodies: bool = False):
+        """Get request logs with token email, newest first; pass the last row's (created_at, id) as before for the next page"""
+        # The request/response bodies can be many KB each; list views leave them out
+        bodies = "rl.request_body, rl.response_body," if include_bodies else ""
+        conditions = []
+        params = []
+        if token_id:
+            conditions.append("rl.token_id = ?")
+            params.append(token_id)
+        if before:
+            # created_at is stored as 'YYYY-MM-DD HH:MM:SS' text, which str(datetime) matches
+            conditions.append("(rl.created_at, rl.id) < (?, ?)")
+            params.extend((str(before[0]), before[1]))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
-
-            if token_id:
-                cursor = await db.execute("""
-                    SELECT
-                        rl.id,
-                        rl.token_id,
-                        rl.operation,
-                        rl.request_body,
-                        rl.response_body,
-                        rl.status_code,
-                        rl.duration,
-                        rl.created_at,
-                        t.email as token_email,
-                        t.name as token_username
-                    FROM request_logs rl
-                    LEFT JOIN tokens t ON rl.token_id = t.id
-                    WHERE rl.token_id = ?
-                    ORDER BY rl.created_at DESC
-                    LIMIT ?
-                """, (token_id, limit))
-            else:
-                cursor = await db.execute("""
-                    SELECT
-                        rl.id,
-                        rl.token_id,
-                        rl.operation,
-                        rl.request_body,
-                        rl.response_body,
-                        rl.status_code,
-                        rl.duration,
-                        rl.created_at,
-                        t.email as token_email,
-                        t.name as token_username
-                    FROM request_logs rl
-                    LEFT JOIN tokens t ON rl.token_id = t.id
-                    ORDER BY rl.created_at DESC
-                    LIMIT ?
-                """, (limit,))
+            cursor = await db.execute(f"""
+                SELECT
+                    rl.id,
+                    rl.token_id,
+                    rl.operation,
+                    {bodies}
+                    rl.status_code,
+                    rl.duration,
+                    rl.created_at,
+                    t.email as token_email,
+                    t.name as token_username
+                FROM request_logs rl
+                LEFT JOIN tokens t ON rl.token_id = t.id
+                {where}
+                ORDER BY rl.created_at DESC, rl.id DESC
+                LIMIT ?
+            """, (*params, limit))
 
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
+    async def get_log_detail(self, log_id: int) -> Optional[dict]:
+        """Get a single request log including its request/response bodies"""
+        async with self._connection() as db:
+            db.row_factory = aiosqlite.Row
+            cursor = await db.execute("""
+                SELECT
+                    rl.id,
+                    rl.token_id,
+                    rl.operation,
+                    rl.request_body,
+                    rl.response_body,
+                    rl.status_code,
+                    rl.duration,
+                    rl.created_at,
+                    t.email as token_email,
+                    t.name as token_username
+                FROM request_logs rl
+                LEFT JOIN tokens t ON rl.token_id = t.id
+                WHERE rl.id = ?
+            """, (log_id,))
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+
     async def init_config_from_toml(self, config_dict: dict, is_first_startup: bool = True):
         """
         Initialize database configuration from setting.toml
@@ -897,7 +916,7 @@ class SqliteAdapter(DatabaseAdapter):
             is_first_startup: If True, initialize all config rows from setting.toml.
                             If False (upgrade mode), only ensure missing config rows exist with default values.
         """
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             if is_first_startup:
                 # First startup: Initialize all config tables with values from setting.toml
                 await self._ensure_config_rows(db, config_dict)
@@ -925,7 +944,7 @@ class SqliteAdapter(DatabaseAdapter):
         if admin_config:
             config.set_admin_username_from_db(admin_config.username)
             config.set_admin_password_from_db(admin_config.password)
-            config.api_key = admin_config.api_key
+            config.set_api_key_from_db(admin_config.api_key)
 
         # Reload cache config
         cache_config = await self.get_cache_config()
@@ -948,7 +967,7 @@ class SqliteAdapter(DatabaseAdapter):
     # Cache config operations
     async def get_cache_config(self) -> CacheConfig:
         """Get cache configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM cache_config WHERE id = 1")
             row = await cursor.fetchone()
@@ -959,7 +978,9 @@ class SqliteAdapter(DatabaseAdapter):
 
     async def update_cache_config(self, enabled: bool = None, timeout: int = None, base_url: Optional[str] = None):
         """Update cache configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
+        if enabled is None and timeout is None and base_url is None:
+            return
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             # Get current values
             cursor = await db.execute("SELECT * FROM cache_config WHERE id = 1")
@@ -998,7 +1019,7 @@ class SqliteAdapter(DatabaseAdapter):
     async def get_debug_config(self) -> 'DebugConfig':
         """Get debug configuration"""
         from ..models import DebugConfig
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute("SELECT * FROM debug_config WHERE id = 1")
             row = await cursor.fetchone()
@@ -1015,7 +1036,9 @@ class SqliteAdapter(DatabaseAdapter):
         mask_token: bool = None
     ):
         """Update debug configuration"""
-        async with aiosqlite.connect(self.db_path) as db:
+        if enabled is None and log_requests is None and log_responses is None and mask_token is None:
+            return
+        async with self._connection() as db:
             db.row_factory = aiosqlite.Row
             # Get current values
             cursor = await db.execute("SELECT * FROM debug_config WHERE id = 1")
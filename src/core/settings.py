@@ -1,100 +1,101 @@
+import copy
+import os
+from functools import lru_cache
 from typing import Any, Dict, Tuple, Type, Optional
 from pathlib import Path
-import tomli
 from pydantic.fields import FieldInfo
 from pydantic import Field, AliasChoices
 from pydantic_settings import BaseSettings, PydanticBaseSettingsSource, SettingsConfigDict
 
+_CONFIG_PATH = Path(__file__).parent.parent.parent / "config" / "setting.toml"
+
+# Only hand pydantic-settings a dotenv file when one exists (resolved against cwd, like env_file)
+_ENV_FILE: Optional[str] = ".env" if Path(".env").is_file() else None
+
+
+@lru_cache(maxsize=1)
+def _parse_toml(stat_key: Tuple[int, int]) -> Dict[str, Any]:
+    """Parse the TOML file; keyed on (mtime_ns, size) so an unchanged file is parsed only once"""
+    # Imported here so processes without a setting.toml never load a TOML parser
+    try:
+        import tomllib as tomli
+    except ImportError:  # Python < 3.11
+        import tomli
+
+    with open(_CONFIG_PATH, "rb") as f:
+        return tomli.load(f)
+
+
+def _load_toml() -> Dict[str, Any]:
+    """Return a private copy of the parsed TOML file, or {} if missing/invalid"""
+    try:
+        st = os.stat(_CONFIG_PATH)
+    except OSError:
+        return {}
+
+    try:
+        return copy.deepcopy(_parse_toml((st.st_mtime_ns, st.st_size)))
+    except Exception:
+        # If TOML file is invalid or cannot be read, ignore it
+        return {}
+
+
+# (TOML section, key) -> Settings field
+_TOML_FIELDS: Tuple[Tuple[str, str, str], ...] = (
+    ("global", "api_key", "API_KEY"),
+    ("global", "admin_username", "ADMIN_USERNAME"),
+    ("global", "admin_password", "ADMIN_PASSWORD"),
+    ("flow", "labs_base_url", "FLOW_LABS_BASE_URL"),
+    ("flow", "api_base_url", "FLOW_API_BASE_URL"),
+    ("flow", "timeout", "FLOW_TIMEOUT"),
+    ("flow", "poll_interval", "FLOW_POLL_INTERVAL"),
+    ("flow", "max_poll_attempts", "FLOW_MAX_POLL_ATTEMPTS"),
+    ("server", "host", "SERVER_HOST"),
+    ("server", "port", "SERVER_PORT"),
+    ("database", "pool_size", "DB_POOL_SIZE"),
+    ("database", "max_overflow", "DB_MAX_OVERFLOW"),
+    ("database", "pool_recycle", "DB_POOL_RECYCLE"),
+    ("debug", "enabled", "DEBUG_ENABLED"),
+    ("debug", "log_requests", "DEBUG_LOG_REQUESTS"),
+    ("debug", "log_responses", "DEBUG_LOG_RESPONSES"),
+    ("debug", "mask_token", "DEBUG_MASK_TOKEN"),
+    ("proxy", "proxy_enabled", "PROXY_ENABLED"),
+    ("proxy", "proxy_url", "PROXY_URL"),
+    ("generation", "image_timeout", "GENERATION_IMAGE_TIMEOUT"),
+    ("generation", "video_timeout", "GENERATION_VIDEO_TIMEOUT"),
+    ("admin", "error_ban_threshold", "ADMIN_ERROR_BAN_THRESHOLD"),
+    ("cache", "enabled", "CACHE_ENABLED"),
+    ("cache", "timeout", "CACHE_TIMEOUT"),
+    ("cache", "base_url", "CACHE_BASE_URL"),
+    ("cache", "hash_algo", "CACHE_HASH_ALGO"),
+)
+
+
 class TomlConfigSettingsSource(PydanticBaseSettingsSource):
     """
     A settings source class that loads variables from a TOML file
     at the project's root (config/setting.toml).
     """
+    def __init__(self, settings_cls: Type[BaseSettings]):
+        super().__init__(settings_cls)
+        # Flatten the TOML structure to match Settings fields once per source, not once per field
+        self._flat_config = self._flatten_toml(_load_toml())
+
     def __call__(self) -> Dict[str, Any]:
-        config_path = Path(__file__).parent.parent.parent / "config" / "setting.toml"
-        
-        if not config_path.exists():
-             return {}
-             
-        try:
-            with open(config_path, "rb") as f:
-                file_content = tomli.load(f)
-        except Exception:
-            return {}
-            
-        return self._flatten_toml(file_content)
+        return dict(self._flat_config)
 
     def get_field_value(
         self, field: FieldInfo, field_name: str
     ) -> Tuple[Any, str, bool]:
-        config_path = Path(__file__).parent.parent.parent / "config" / "setting.toml"
-        
-        if not config_path.exists():
-             return None, field_name, False
-             
-        try:
-            with open(config_path, "rb") as f:
-                file_content = tomli.load(f)
-        except Exception:
-            # If TOML file is invalid or cannot be read, ignore it
-            return None, field_name, False
-            
-        # Flatten the TOML structure to match Settings fields
-        flat_config = self._flatten_toml(file_content)
-        
-        val = flat_config.get(field_name)
+        val = self._flat_config.get(field_name)
         return val, field_name, False
 
     def _flatten_toml(self, config: Dict[str, Any]) -> Dict[str, Any]:
-        flat = {}
-        
-        # Global
-        g = config.get("global", {})
-        if "api_key" in g: flat["API_KEY"] = g["api_key"]
-        if "admin_username" in g: flat["ADMIN_USERNAME"] = g["admin_username"]
-        if "admin_password" in g: flat["ADMIN_PASSWORD"] = g["admin_password"]
-        
-        # Flow
-        f = config.get("flow", {})
-        if "labs_base_url" in f: flat["FLOW_LABS_BASE_URL"] = f["labs_base_url"]
-        if "api_base_url" in f: flat["FLOW_API_BASE_URL"] = f["api_base_url"]
-        if "timeout" in f: flat["FLOW_TIMEOUT"] = f["timeout"]
-        if "poll_interval" in f: flat["FLOW_POLL_INTERVAL"] = f["poll_interval"]
-        if "max_poll_attempts" in f: flat["FLOW_MAX_POLL_ATTEMPTS"] = f["max_poll_attempts"]
-        
-        # Server
-        s = config.get("server", {})
-        if "host" in s: flat["SERVER_HOST"] = s["host"]
-        if "port" in s: flat["SERVER_PORT"] = s["port"]
-        
-        # Debug
-        d = config.get("debug", {})
-        if "enabled" in d: flat["DEBUG_ENABLED"] = d["enabled"]
-        if "log_requests" in d: flat["DEBUG_LOG_REQUESTS"] = d["log_requests"]
-        if "log_responses" in d: flat["DEBUG_LOG_RESPONSES"] = d["log_responses"]
-        if "mask_token" in d: flat["DEBUG_MASK_TOKEN"] = d["mask_token"]
-        
-        # Proxy
-        p = config.get("proxy", {})
-        if "proxy_enabled" in p: flat["PROXY_ENABLED"] = p["proxy_enabled"]
-        if "proxy_url" in p: flat["PROXY_URL"] = p["proxy_url"]
-        
-        # Generation
-        gen = config.get("generation", {})
-        if "image_timeout" in gen: flat["GENERATION_IMAGE_TIMEOUT"] = gen["image_timeout"]
-        if "video_timeout" in gen: flat["GENERATION_VIDEO_TIMEOUT"] = gen["video_timeout"]
-        
-        # Admin
-        a = config.get("admin", {})
-        if "error_ban_threshold" in a: flat["ADMIN_ERROR_BAN_THRESHOLD"] = a["error_ban_threshold"]
-        
-        # Cache
-        c = config.get("cache", {})
-        if "enabled" in c: flat["CACHE_ENABLED"] = c["enabled"]
-        if "timeout" in c: flat["CACHE_TIMEOUT"] = c["timeout"]
-        if "base_url" in c: flat["CACHE_BASE_URL"] = c["base_url"]
-        
-        return flat
+        return {
+            field: config[section][key]
+            for section, key, field in _TOML_FIELDS
+            if key in config.get(section, ())
+        }
 
     def prepare_field_value(
         self, field: FieldInfo, field_name: str, value: Any, value_is_complex: bool
@@ -107,6 +108,10 @@ class Settings(BaseSettings):
     ADMIN_USERNAME: str = Field(validation_alias=AliasChoices("admin_username", "ADMIN_USERNAME"), default="admin")
     ADMIN_PASSWORD: str = Field(validation_alias=AliasChoices("admin_password", "ADMIN_PASSWORD"), default="admin")
     DATABASE_URL: Optional[str] = None 
+    # Postgres connection pool (ignored by the SQLite backend)
+    DB_POOL_SIZE: int = Field(validation_alias=AliasChoices("db_pool_size", "DB_POOL_SIZE"), default=20)
+    DB_MAX_OVERFLOW: int = Field(validation_alias=AliasChoices("db_max_overflow", "DB_MAX_OVERFLOW"), default=10)
+    DB_POOL_RECYCLE: int = Field(validation_alias=AliasChoices("db_pool_recycle", "DB_POOL_RECYCLE"), default=1800)
 
     # Flow
     FLOW_LABS_BASE_URL: str = Field(validation_alias=AliasChoices("flow_labs_base_url", "FLOW_LABS_BASE_URL"), default="https://labs.google/fx/api")
@@ -141,6 +146,7 @@ class Settings(BaseSettings):
     CACHE_ENABLED: bool = Field(validation_alias=AliasChoices("cache_enabled", "CACHE_ENABLED"), default=False)
     CACHE_TIMEOUT: int = Field(validation_alias=AliasChoices("cache_timeout", "CACHE_TIMEOUT"), default=7200)
     CACHE_BASE_URL: Optional[str] = Field(validation_alias=AliasChoices("cache_base_url", "CACHE_BASE_URL"), default="")
+    CACHE_HASH_ALGO: str = Field(validation_alias=AliasChoices("cache_hash_algo", "CACHE_HASH_ALGO"), default="md5")
 
     # Storage
     STORAGE_BACKEND: str = Field(validation_alias=AliasChoices("storage_backend", "STORAGE_BACKEND"), default="local")
@@ -152,7 +158,7 @@ class Settings(BaseSettings):
     S3_PUBLIC_DOMAIN: Optional[str] = Field(validation_alias=AliasChoices("s3_public_domain", "S3_PUBLIC_DOMAIN"), default=None)
 
     model_config = SettingsConfigDict(
-        env_file=".env",
+        env_file=_ENV_FILE,
         env_file_encoding="utf-8",
         extra="ignore",
         case_sensitive=True
@@ -195,6 +201,11 @@ class Settings(BaseSettings):
                 "host": self.SERVER_HOST,
                 "port": self.SERVER_PORT,
             },
+            "database": {
+                "pool_size": self.DB_POOL_SIZE,
+                "max_overflow": self.DB_MAX_OVERFLOW,
+                "pool_recycle": self.DB_POOL_RECYCLE,
+            },
             "debug": {
                 "enabled": self.DEBUG_ENABLED,
                 "log_requests": self.DEBUG_LOG_REQUESTS,
@@ -216,6 +227,7 @@ class Settings(BaseSettings):
                 "enabled": self.CACHE_ENABLED,
                 "timeout": self.CACHE_TIMEOUT,
                 "base_url": self.CACHE_BASE_URL or "",
+                "hash_algo": self.CACHE_HASH_ALGO,
             },
             "storage": {
                 "backend": self.STORAGE_BACKEND,
@@ -228,4 +240,11 @@ class Settings(BaseSettings):
             }
         }
 
-settings = Settings()
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build the validated Settings once per process and share it"""
+    return Settings()
+
+
+settings = get_settings()
@@ -5,11 +5,11 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
 import os
 
 from .core.config import config
-from .core.db.sqlite import SqliteAdapter
-from .core.db.postgres import PostgresAdapter
+from .core.db.base import SCHEMA_VERSION
 from .services.flow_client import FlowClient
 from .services.proxy_manager import ProxyManager
 from .services.token_manager import TokenManager
@@ -18,6 +18,9 @@ from .services.concurrency_manager import ConcurrencyManager
 from .services.generation_handler import GenerationHandler
 from .api import routes, admin
 
+# Read once: the deployment environment does not change while the process runs
+IS_VERCEL = bool(os.environ.get("VERCEL"))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -40,54 +43,57 @@ async def lifespan(app: FastAPI):
     if is_first_startup:
         print("🎉 First startup detected. Initializing database and configuration from setting.toml...")
         await db.init_config_from_toml(config_dict, is_first_startup=True)
+        await db.set_schema_version(SCHEMA_VERSION)
         print("✓ Database and configuration initialized successfully.")
     else:
-        print("🔄 Existing database detected. Checking for missing tables and columns...")
-        await db.check_and_migrate_db(config_dict)
-        print("✓ Database migration check completed.")
-
-    # Load admin config from database
-    admin_config = await db.get_admin_config()
+        print("🔄 Existing database detected. Checking schema version...")
+        if await db.migrate_if_needed(config_dict):
+            print("✓ Database migration check completed.")
+        else:
+            print("✓ Database schema is up to date; config rows verified.")
+
+    # Load all runtime config rows and the token list from database concurrently
+    (admin_config, proxy_config, generation_config, cache_config, debug_config), tokens = await asyncio.gather(
+        db.get_all_config(),
+        token_manager.get_all_tokens(),
+    )
+
+    # Admin config
     if admin_config:
         config.set_admin_username_from_db(admin_config.username)
         config.set_admin_password_from_db(admin_config.password)
-        config.api_key = admin_config.api_key
+        config.set_api_key_from_db(admin_config.api_key)
         config.set_error_ban_threshold(admin_config.error_ban_threshold)
 
-    # Load cache configuration from database
-    cache_config = await db.get_cache_config()
+    # Cache configuration
     if cache_config:
         config.set_cache_enabled(cache_config.cache_enabled)
         config.set_cache_timeout(cache_config.cache_timeout)
         config.set_cache_base_url(cache_config.cache_base_url or "")
 
-    # Load generation configuration from database
-    generation_config = await db.get_generation_config()
+    # Generation configuration
     if generation_config:
         config.set_image_timeout(generation_config.image_timeout)
         config.set_video_timeout(generation_config.video_timeout)
 
-    # Load debug configuration from database
-    debug_config = await db.get_debug_config()
+    # Debug configuration
     if debug_config:
         config.set_debug_enabled(debug_config.enabled)
         config.set_debug_log_requests(debug_config.log_requests)
         config.set_debug_log_responses(debug_config.log_responses)
         config.set_debug_mask_token(debug_config.mask_token)
 
-    # Load proxy configuration from database
-    proxy_config = await db.get_proxy_config()
+    # Proxy configuration
     if proxy_config:
         config.set_proxy_enabled(proxy_config.enabled)
         config.set_proxy_url(proxy_config.proxy_url)
 
     # Initialize concurrency manager
-    tokens = await token_manager.get_all_tokens()
     await concurrency_manager.initialize(tokens)
 
     # File cache cleanup is now manual/on-demand via purge endpoint
     # Start file cache cleanup task
-    if not os.getenv("VERCEL"):
+    if not IS_VERCEL:
         await generation_handler.file_cache.start_cleanup_task()
         print(f"✓ File cache cleanup task started")
     else:
@@ -100,20 +106,26 @@ async def lifespan(app: FastAPI):
     print(f"✓ Server running on http://{config.server_host}:{config.server_port}")
     print("=" * 60)
 
-    yield
-
-    # Shutdown
-    print("Flow2API Shutting down...")
-    # Stop file cache cleanup task
-    if not os.getenv("VERCEL"):
-        await generation_handler.file_cache.stop_cleanup_task()
-        print("✓ File cache cleanup task stopped")
-    else:
-        print("✓ File cache cleanup task stopped (Vercel)")
+    try:
+        yield
+    finally:
+        # Shutdown
+        print("Flow2API Shutting down...")
+        try:
+            # Stop file cache cleanup task
+            if not IS_VERCEL:
+                await generation_handler.file_cache.stop_cleanup_task()
+                print("✓ File cache cleanup task stopped")
+            else:
+                print("✓ File cache cleanup task stopped (Vercel)")
+            await generation_handler.file_cache.aclose()
+        finally:
+            # Flush buffered database writes, even if the app is exiting on an error
+            await db.close()
 
 
 # Initialize components
-if os.getenv("VERCEL"):
+if IS_VERCEL:
     print("🚀 Running on Vercel environment")
     if not config.database_url:
         print("⚠️ WARNING: DATABASE_URL environment variable is missing!")
@@ -121,9 +133,17 @@ if os.getenv("VERCEL"):
 
 if config.database_url and (config.database_url.startswith("postgres://") or config.database_url.startswith("postgresql://")):
     print(f"🔌 Using Postgres database")
-    db = PostgresAdapter(config.database_url)
+    # Adapters are imported on demand so a cold start only loads the chosen driver stack
+    from .core.db.postgres import PostgresAdapter
+    db = PostgresAdapter(
+        config.database_url,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_recycle=config.db_pool_recycle,
+    )
 else:
-    if os.getenv("VERCEL"):
+    from .core.db.sqlite import SqliteAdapter
+    if IS_VERCEL:
         print("⚠️ WARNING: No valid DATABASE_URL found. Using SQLite in ephemeral /tmp storage (Data will be lost on restart!)")
         # On Vercel, only /tmp is writable
         db_path = "/tmp/flow.db"
@@ -173,17 +193,14 @@ app.include_router(routes.router)
 app.include_router(admin.router)
 
 # Static files - serve tmp directory for cached files if using local backend
+# (StaticFiles answers Range requests, so players can seek in cached videos)
 if config.storage_backend == "local":
-    tmp_dir = Path(__file__).parent.parent / "tmp"
+    if IS_VERCEL:
+        tmp_dir = Path("/tmp")
+    else:
+        tmp_dir = Path(__file__).parent.parent / "tmp"
     tmp_dir.mkdir(exist_ok=True)
     app.mount("/tmp", StaticFiles(directory=str(tmp_dir)), name="tmp")
-# Static files - serve tmp directory for cached files
-if os.getenv("VERCEL"):
-    tmp_dir = Path("/tmp")
-else:
-    tmp_dir = Path(__file__).parent.parent / "tmp"
-tmp_dir.mkdir(exist_ok=True)
-app.mount("/tmp", StaticFiles(directory=str(tmp_dir)), name="tmp")
 
 # HTML routes for frontend
 static_path = Path(__file__).parent.parent / "static"
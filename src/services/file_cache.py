@@ -3,13 +3,33 @@ import asyncio
 import hashlib
 import time
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Optional
 from curl_cffi.requests import AsyncSession
 from ..core.logger import debug_logger
 from ..core.config import config
 from .storage_backends import LocalStorageBackend, S3StorageBackend
 
+# Concurrent connections kept by the shared download session
+_DOWNLOAD_MAX_CLIENTS = 20
+
+# Cache file extension per media type
+_MEDIA_EXTENSIONS = {"video": ".mp4", "image": ".jpg"}
+
+# URL -> cache key hashers; md5 is the legacy default so existing cache files stay valid
+_URL_HASHERS: Dict[str, Callable[[bytes], str]] = {
+    "md5": lambda data: hashlib.md5(data).hexdigest(),
+    "blake2b": lambda data: hashlib.blake2b(data, digest_size=16).hexdigest(),
+}
+
+try:
+    import blake3
+
+    _URL_HASHERS["blake3"] = lambda data: blake3.blake3(data).hexdigest(16)
+except ImportError:  # blake3 is optional
+    pass
+
 
 class FileCache:
     """File caching service for videos"""
@@ -30,6 +50,20 @@ class FileCache:
         self.cache_dir.mkdir(exist_ok=True)
         self.default_timeout = default_timeout
         self.proxy_manager = proxy_manager
+
+        hash_algo = config.cache_hash_algo.lower()
+        if hash_algo not in _URL_HASHERS:
+            debug_logger.log_warning(f"Cache hash algorithm '{hash_algo}' unavailable, using md5")
+            hash_algo = "md5"
+        # The same URL is hashed for the exists check and again for the save
+        self._hash_url = lru_cache(maxsize=4096)(_URL_HASHERS[hash_algo])
+
+        # Long-lived HTTP session, created on first download so it binds to the running loop
+        self._session: Optional[AsyncSession] = None
+        self._session_lock = asyncio.Lock()
+
+        # Downloads in progress, keyed by cache filename, so concurrent requests share one
+        self._inflight: Dict[str, "asyncio.Task[str]"] = {}
         
         # Initialize storage backend
         backend_type = config.storage_backend
@@ -57,6 +91,21 @@ class FileCache:
         """Deprecated: No-op"""
         pass
         
+    async def _get_session(self) -> AsyncSession:
+        """Return the shared download session, creating it on first use"""
+        if self._session is None:
+            async with self._session_lock:
+                if self._session is None:
+                    self._session = AsyncSession(max_clients=_DOWNLOAD_MAX_CLIENTS, timeout=60)
+        return self._session
+
+    async def aclose(self):
+        """Close the shared download session and the storage backend"""
+        session, self._session = self._session, None
+        if session is not None:
+            await session.close()
+        await self.backend.aclose()
+
     async def purge_expired_files(self):
         """Purge expired files based on TTL"""
         try:
@@ -71,17 +120,8 @@ class FileCache:
     def _generate_cache_filename(self, url: str, media_type: str) -> str:
         """Generate unique filename for cached file"""
         # Use URL hash as filename
-        url_hash = hashlib.md5(url.encode()).hexdigest()
-
-        # Determine file extension
-        if media_type == "video":
-            ext = ".mp4"
-        elif media_type == "image":
-            ext = ".jpg"
-        else:
-            ext = ""
-
-        return f"{url_hash}{ext}"
+        url_hash = self._hash_url(url.encode())
+        return f"{url_hash}{_MEDIA_EXTENSIONS.get(media_type, '')}"
 
     async def download_and_cache(self, url: str, media_type: str) -> str:
         """
@@ -95,7 +135,17 @@ class FileCache:
             Public URL of the cached file
         """
         filename = self._generate_cache_filename(url, media_type)
-        
+
+        task = self._inflight.get(filename)
+        if task is None:
+            task = asyncio.ensure_future(self._download_and_cache(url, filename, media_type))
+            self._inflight[filename] = task
+            task.add_done_callback(lambda _: self._inflight.pop(filename, None))
+        # Shielded so one caller being cancelled does not abort the download for the others
+        return await asyncio.shield(task)
+
+    async def _download_and_cache(self, url: str, filename: str, media_type: str) -> str:
+        """Fetch url into the backend as filename unless it is already cached"""
         # Check if already exists in backend
         if await self.backend.exists(filename):
             debug_logger.log_info(f"Cache hit: {filename}")
@@ -108,25 +158,29 @@ class FileCache:
             # Get proxy if available
             proxy_url = None
             if self.proxy_manager:
-                proxy_config = await self.proxy_manager.get_proxy_config()
-                if proxy_config and proxy_config.enabled and proxy_config.proxy_url:
-                    proxy_url = proxy_config.proxy_url
-
-            # Download with proxy support
-            async with AsyncSession() as session:
-                proxies = {"http": proxy_url, "https": proxy_url} if proxy_url else None
-                response = await session.get(url, timeout=60, proxies=proxies)
+                proxy_url = await self.proxy_manager.get_proxy_url()
 
+            # Download with proxy support; proxies are passed per request so the
+            # pooled connections survive proxy changes
+            session = await self._get_session()
+            proxies = {"http": proxy_url, "https": proxy_url} if proxy_url else None
+            async with session.stream("GET", url, timeout=60, proxies=proxies) as response:
                 if response.status_code != 200:
                     raise Exception(f"Download failed: HTTP {response.status_code}")
-                
-                content = response.content
 
-                # Save to backend
-                public_url = await self.backend.save(filename, content, media_type)
+                # Pipe the body straight into the backend instead of buffering it
+                size = 0
+
+                async def chunks():
+                    nonlocal size
+                    async for chunk in response.aiter_content():
+                        size += len(chunk)
+                        yield chunk
+
+                public_url = await self.backend.save_stream(filename, chunks(), media_type)
 
-                debug_logger.log_info(f"File cached: {filename} ({len(content)} bytes)")
-                return public_url
+            debug_logger.log_info(f"File cached: {filename} ({size} bytes)")
+            return public_url
 
         except Exception as e:
             debug_logger.log_error(
@@ -7,6 +7,7 @@ from typing import Optional, AsyncGenerator, List, Dict, Any
 from ..core.logger import debug_logger
 from ..core.config import Config
 from ..core.models import Task, RequestLog
+from ..core.db.base import dump_json
 from .file_cache import FileCache
 
 
@@ -851,8 +852,8 @@ class GenerationHandler:
             log = RequestLog(
                 token_id=token_id,
                 operation=operation,
-                request_body=json.dumps(request_data, ensure_ascii=False),
-                response_body=json.dumps(response_data, ensure_ascii=False),
+                request_body=dump_json(request_data),
+                response_body=dump_json(response_data),
                 status_code=status_code,
                 duration=duration
             )
@@ -3,13 +3,35 @@ import os
 import time
 import asyncio
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator, Awaitable, Callable, Dict, Tuple, TypeVar
 import shutil
-from datetime import datetime, timezone
-import boto3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+import aioboto3
 from botocore.exceptions import ClientError
 from ..core.logger import debug_logger
 
+# Content-Type stored with uploaded objects, per media type
+_CONTENT_TYPES = {"video": "video/mp4", "image": "image/jpeg"}
+
+T = TypeVar("T")
+
+# Worker threads dedicated to local cache file I/O
+_LOCAL_IO_WORKERS = 8
+
+# Largest slice handed to a single os.write for local cache files
+_WRITE_CHUNK = 1024 * 1024
+
+# Lifetime of presigned S3 URLs, and how long before expiry a cached one is replaced
+_PRESIGN_EXPIRES = 3600 * 24
+_PRESIGN_MARGIN = 300
+
+# delete_objects batches in flight at once during an S3 purge
+_S3_PURGE_CONCURRENCY = 4
+
+# S3 multipart parts must be at least 5 MiB, except the last one
+_S3_PART_SIZE = 8 * 1024 * 1024
+
 class StorageBackend(ABC):
     """Abstract base class for storage backends"""
 
@@ -23,6 +45,15 @@ class StorageBackend(ABC):
         """Save content and return public/signed URL"""
         pass
 
+    async def save_stream(self, filename: str, chunks: AsyncIterator[bytes], media_type: str) -> str:
+        """Save content arriving as an async stream of chunks and return its URL.
+
+        Backends that can write incrementally override this; the default
+        collects the stream and defers to save().
+        """
+        content = b"".join([chunk async for chunk in chunks])
+        return await self.save(filename, content, media_type)
+
     @abstractmethod
     async def get_url(self, filename: str) -> str:
         """Get public/signed URL for existing file"""
@@ -38,6 +69,10 @@ class StorageBackend(ABC):
         """Purge expired files based on TTL"""
         pass
 
+    async def aclose(self):
+        """Release backend resources (no-op unless the backend holds a client)"""
+        pass
+
 class LocalStorageBackend(StorageBackend):
     """Local file system storage backend"""
 
@@ -45,19 +80,74 @@ class LocalStorageBackend(StorageBackend):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.base_url = base_url.rstrip("/")
+        # Private pool for disk I/O, so bursts of cache writes cannot starve the
+        # default executor used elsewhere in the app
+        self._io_pool = ThreadPoolExecutor(max_workers=_LOCAL_IO_WORKERS, thread_name_prefix="cache-io")
+
+    def _run(self, func: Callable[..., T], *args) -> Awaitable[T]:
+        return asyncio.get_running_loop().run_in_executor(self._io_pool, func, *args)
+
+    async def aclose(self):
+        self._io_pool.shutdown(wait=False, cancel_futures=True)
 
     async def exists(self, filename: str) -> bool:
+        # A single stat: cheaper inline than a thread hop
         return (self.cache_dir / filename).exists()
 
     async def save(self, filename: str, content: bytes, media_type: str) -> str:
         file_path = self.cache_dir / filename
-        # Write file in a thread to avoid blocking event loop
-        await asyncio.to_thread(self._write_file, file_path, content)
+        # Write file in a worker thread to avoid blocking event loop
+        await self._run(self._write_file, file_path, content)
         return await self.get_url(filename)
 
     def _write_file(self, path: Path, content: bytes):
-        with open(path, "wb") as f:
-            f.write(content)
+        fd = self._open_for_write(path)
+        try:
+            self._write_all(fd, content)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._close_written(fd)
+
+    @staticmethod
+    def _open_for_write(path: Path) -> int:
+        return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+    @staticmethod
+    def _write_all(fd: int, content: bytes):
+        # Bounded slices keep each syscall short on large videos
+        view = memoryview(content)
+        for offset in range(0, len(view), _WRITE_CHUNK):
+            chunk = view[offset:offset + _WRITE_CHUNK]
+            while chunk:
+                chunk = chunk[os.write(fd, chunk):]
+
+    @staticmethod
+    def _close_written(fd: int):
+        try:
+            # Cached files are written once and then served by the HTTP layer; flush and
+            # drop their pages so a bulk write does not evict hotter page cache entries
+            if hasattr(os, "posix_fadvise"):
+                os.fdatasync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+    async def save_stream(self, filename: str, chunks: AsyncIterator[bytes], media_type: str) -> str:
+        file_path = self.cache_dir / filename
+        # Write to a temporary name so exists() never sees a partial file
+        part_path = file_path.with_name(file_path.name + ".part")
+        fd = await self._run(self._open_for_write, part_path)
+        try:
+            async for chunk in chunks:
+                await self._run(self._write_all, fd, chunk)
+        except BaseException:
+            await self._run(os.close, fd)
+            await self._run(part_path.unlink, True)
+            raise
+        await self._run(self._close_written, fd)
+        await self._run(os.replace, part_path, file_path)
+        return await self.get_url(filename)
 
     async def get_url(self, filename: str) -> str:
         # Assuming base_url points to the server root where /tmp is mounted or served
@@ -86,28 +176,26 @@ class LocalStorageBackend(StorageBackend):
         file_path = self.cache_dir / filename
         try:
             if file_path.exists():
-                await asyncio.to_thread(os.remove, file_path)
+                await self._run(os.remove, file_path)
                 return True
         except Exception as e:
             debug_logger.log_error(f"Failed to delete local file {filename}: {str(e)}")
         return False
 
     async def purge_expired(self, ttl: int) -> int:
+        # One worker thread scans and unlinks, instead of a thread hop per stat/remove
+        return await self._run(self._scan_and_purge, ttl)
+
+    def _scan_and_purge(self, ttl: int) -> int:
         removed_count = 0
-        current_time = time.time()
-        
-        # Use asyncio.to_thread for directory iteration if there are many files
-        files = await asyncio.to_thread(lambda: list(self.cache_dir.iterdir()))
-        
-        for file_path in files:
-            if file_path.is_file():
+        cutoff = time.time() - ttl
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
                 try:
-                    stat = await asyncio.to_thread(os.stat, file_path)
-                    file_age = current_time - stat.st_mtime
-                    if file_age > ttl:
-                        await asyncio.to_thread(os.remove, file_path)
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
                         removed_count += 1
-                except Exception:
+                except OSError:
                     pass
         return removed_count
 
@@ -122,36 +210,63 @@ class S3StorageBackend(StorageBackend):
                  public_domain: Optional[str] = None):
         
         self.bucket_name = bucket_name
-        self.client = boto3.client(
-            's3',
-            region_name=region_name,
-            endpoint_url=endpoint_url,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key
-        )
+        self.region_name = region_name
+        self.endpoint_url = endpoint_url
+        self.access_key = access_key
+        self.secret_key = secret_key
         self.public_domain = public_domain
 
+        # Session and native async client are built on first use: this keeps botocore's
+        # service model loading out of startup and binds the client to the running loop
+        self._client = None
+        self._client_stack: Optional[AsyncExitStack] = None
+        self._client_lock = asyncio.Lock()
+
+        # filename -> (presigned URL, monotonic time after which it is re-signed)
+        self._url_cache: Dict[str, Tuple[str, float]] = {}
+
+    async def _get_client(self):
+        """Return the shared S3 client, creating it on first use"""
+        if self._client is None:
+            async with self._client_lock:
+                if self._client is None:
+                    session = aioboto3.Session(
+                        aws_access_key_id=self.access_key,
+                        aws_secret_access_key=self.secret_key
+                    )
+                    stack = AsyncExitStack()
+                    self._client = await stack.enter_async_context(session.client(
+                        's3',
+                        region_name=self.region_name,
+                        endpoint_url=self.endpoint_url
+                    ))
+                    self._client_stack = stack
+        return self._client
+
+    async def aclose(self):
+        """Close the shared S3 client"""
+        stack, self._client_stack, self._client = self._client_stack, None, None
+        if stack is not None:
+            await stack.aclose()
+
     async def exists(self, filename: str) -> bool:
+        client = await self._get_client()
         try:
-            await asyncio.to_thread(
-                self.client.head_object,
-                Bucket=self.bucket_name,
-                Key=filename
-            )
+            await client.head_object(Bucket=self.bucket_name, Key=filename)
             return True
         except ClientError:
             return False
 
     async def save(self, filename: str, content: bytes, media_type: str) -> str:
-        content_type = "video/mp4" if media_type == "video" else "image/jpeg"
+        content_type = _CONTENT_TYPES.get(media_type, "application/octet-stream")
         
         # Store timestamp in metadata for TTL
         metadata = {
             "created_at": str(int(time.time()))
         }
 
-        await asyncio.to_thread(
-            self.client.put_object,
+        client = await self._get_client()
+        await client.put_object(
             Bucket=self.bucket_name,
             Key=filename,
             Body=content,
@@ -161,6 +276,74 @@ class S3StorageBackend(StorageBackend):
         
         return await self.get_url(filename)
 
+    async def save_stream(self, filename: str, chunks: AsyncIterator[bytes], media_type: str) -> str:
+        content_type = _CONTENT_TYPES.get(media_type, "application/octet-stream")
+        metadata = {
+            "created_at": str(int(time.time()))
+        }
+
+        client = await self._get_client()
+        # Buffer up to one part; small files never start a multipart upload
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                if len(buffer) < _S3_PART_SIZE:
+                    continue
+                if upload_id is None:
+                    upload = await client.create_multipart_upload(
+                        Bucket=self.bucket_name,
+                        Key=filename,
+                        ContentType=content_type,
+                        Metadata=metadata
+                    )
+                    upload_id = upload["UploadId"]
+                parts.append(await self._upload_part(client, filename, upload_id, len(parts) + 1, bytes(buffer)))
+                buffer.clear()
+
+            if upload_id is None:
+                await client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=filename,
+                    Body=bytes(buffer),
+                    ContentType=content_type,
+                    Metadata=metadata
+                )
+            else:
+                if buffer:
+                    parts.append(await self._upload_part(client, filename, upload_id, len(parts) + 1, bytes(buffer)))
+                await client.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=filename,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": parts}
+                )
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await client.abort_multipart_upload(
+                        Bucket=self.bucket_name,
+                        Key=filename,
+                        UploadId=upload_id
+                    )
+                except Exception as e:
+                    debug_logger.log_error(f"Failed to abort S3 upload {filename}: {str(e)}")
+            raise
+
+        return await self.get_url(filename)
+
+    async def _upload_part(self, client, filename: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        part = await client.upload_part(
+            Bucket=self.bucket_name,
+            Key=filename,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        return {"ETag": part["ETag"], "PartNumber": part_number}
+
     async def get_url(self, filename: str) -> str:
         if self.public_domain:
             return f"{self.public_domain.rstrip('/')}/{filename}"
@@ -170,73 +353,73 @@ class S3StorageBackend(StorageBackend):
         # So we need a reasonably long expiration, maybe matching the cache TTL or a default like 1 hour.
         # But if we want them to remain accessible "across cold starts", presigned URL is good.
         
-        url = await asyncio.to_thread(
-            self.client.generate_presigned_url,
+        # A signed URL stays valid for its whole lifetime, so reuse it until shortly before expiry
+        cached = self._url_cache.get(filename)
+        now = time.monotonic()
+        if cached is not None and now < cached[1]:
+            return cached[0]
+
+        client = await self._get_client()
+        url = await client.generate_presigned_url(
             'get_object',
             Params={'Bucket': self.bucket_name, 'Key': filename},
-            ExpiresIn=3600 * 24  # 24 hours, or configurable
+            ExpiresIn=_PRESIGN_EXPIRES
         )
+        self._url_cache[filename] = (url, now + _PRESIGN_EXPIRES - _PRESIGN_MARGIN)
         return url
 
     async def delete(self, filename: str) -> bool:
+        self._url_cache.pop(filename, None)
         try:
-            await asyncio.to_thread(
-                self.client.delete_object,
-                Bucket=self.bucket_name,
-                Key=filename
-            )
+            client = await self._get_client()
+            await client.delete_object(Bucket=self.bucket_name, Key=filename)
             return True
         except Exception as e:
             debug_logger.log_error(f"Failed to delete S3 object {filename}: {str(e)}")
             return False
 
     async def purge_expired(self, ttl: int) -> int:
-        removed_count = 0
-        current_time = int(time.time())
-        
-        # List objects
-        # Note: This might be slow for large buckets. 
-        # But the requirement is an explicit purge job.
-        
-        paginator = self.client.get_paginator('list_objects_v2')
-        
-        # We need to run this in a thread because boto3 is blocking
-        def _purge():
-            count = 0
-            for page in paginator.paginate(Bucket=self.bucket_name):
-                if 'Contents' not in page:
+        cutoff = time.time() - ttl
+
+        # Cache objects are written once, so LastModified from the listing is the
+        # upload time; no per-key head_object is needed to read created_at
+        client = await self._get_client()
+        paginator = client.get_paginator('list_objects_v2')
+        # Batch deletes overlap with listing the next pages, a few batches at a time
+        semaphore = asyncio.Semaphore(_S3_PURGE_CONCURRENCY)
+        batches = []
+
+        try:
+            async for page in paginator.paginate(Bucket=self.bucket_name):
+                expired = [
+                    {'Key': obj['Key']}
+                    for obj in page.get('Contents', ())
+                    if obj['LastModified'].timestamp() < cutoff
+                ]
+                if not expired:
                     continue
-                
-                for obj in page['Contents']:
-                    key = obj['Key']
-                    
-                    # We need to get head_object to get custom metadata
-                    # list_objects_v2 does NOT return custom metadata
-                    try:
-                        head = self.client.head_object(Bucket=self.bucket_name, Key=key)
-                        metadata = head.get('Metadata', {})
-                        created_at_str = metadata.get('created_at')
-                        
-                        if created_at_str:
-                            created_at = int(created_at_str)
-                            age = current_time - created_at
-                            if age > ttl:
-                                self.client.delete_object(Bucket=self.bucket_name, Key=key)
-                                count += 1
-                        else:
-                            # Fallback to LastModified if metadata is missing?
-                            # Maybe safer not to delete if we are unsure.
-                            # But if we just uploaded it, it should have metadata.
-                            # Let's use LastModified as fallback if metadata missing.
-                            last_modified = obj['LastModified'].replace(tzinfo=timezone.utc).timestamp()
-                            age = current_time - last_modified
-                            if age > ttl:
-                                self.client.delete_object(Bucket=self.bucket_name, Key=key)
-                                count += 1
-                                
-                    except Exception as e:
-                        debug_logger.log_error(f"Error checking/deleting {key}: {str(e)}")
-            return count
-
-        removed_count = await asyncio.to_thread(_purge)
-        return removed_count
+                for item in expired:
+                    self._url_cache.pop(item['Key'], None)
+                batches.append(asyncio.ensure_future(self._delete_batch(client, expired, semaphore)))
+        finally:
+            # Await the deletes already scheduled even if listing fails part-way through
+            results = await asyncio.gather(*batches, return_exceptions=True)
+
+        return sum(result for result in results if isinstance(result, int))
+
+    async def _delete_batch(self, client, objects: List[dict], semaphore: asyncio.Semaphore) -> int:
+        """Delete one listing page of keys (at most 1000, the delete_objects limit)"""
+        async with semaphore:
+            try:
+                result = await client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': objects, 'Quiet': True}
+                )
+            except Exception as e:
+                debug_logger.log_error(f"Error deleting expired objects: {str(e)}")
+                return 0
+
+        errors = result.get('Errors', [])
+        for error in errors:
+            debug_logger.log_error(f"Error deleting {error.get('Key')}: {error.get('Message')}")
+        return len(objects) - len(errors)
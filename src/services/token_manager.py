@@ -1,7 +1,7 @@
 """Token manager for Flow2API with AT auto-refresh"""
 import asyncio
 from datetime import datetime, timedelta, timezone
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator
 from ..core.db.base import DatabaseAdapter
 from ..core.models import Token, Project
 from ..core.logger import debug_logger
@@ -23,6 +23,10 @@ class TokenManager:
         """Get all tokens"""
         return await self.db.get_all_tokens()
 
+    def iter_all_tokens(self) -> AsyncIterator[Token]:
+        """Stream all tokens without materializing the full list"""
+        return self.db.iter_all_tokens()
+
     async def get_active_tokens(self) -> List[Token]:
         """Get all active tokens"""
         return await self.db.get_active_tokens()